@@ -10,6 +10,8 @@ add specific information for different kinds of
 events, if we need to.
 """
 
+from typing import Dict, List, Tuple
+
 # ------------
 #  The events
 # ------------
@@ -19,7 +21,13 @@ class Event(object):
     """Abstract base class of all events, both for MVC
     and for other purposes.
     """
-    pass
+
+    def coalesce_key(self) -> object:
+        """Events with the same key in the same batch are
+        coalesced: a batched listener gets only the last one.
+        None means never coalesce.
+        """
+        return None
 
 
 # ---------------
@@ -30,7 +38,19 @@ class Listener(object):
     """Abstract base class for listeners.
     Subclass this to make the notification do
     something useful.
+
+    Some events only trace what the program is paying attention
+    to (e.g., the tiles a tactic is scanning).  They are costly
+    and usually uninteresting, so they are sent only to
+    listeners that set scan to True.
+
+    While a Batch is open, events are held back and then
+    delivered together, without the ones superseded by later
+    events with the same coalesce_key.  Listeners that need
+    every event as it happens set batched to False.
     """
+    scan = False
+    batched = True
 
     def __init__(self):
         """Default constructor for simple listeners without state"""
@@ -41,3 +61,64 @@ class Listener(object):
         overridden in concrete classes.
         """
         raise NotImplementedError("You must override Listener.notify")
+
+    def notify_batch(self, events: List[Event]):
+        """Deliver a batch of events.  By default, one at a time."""
+        for event in events:
+            self.notify(event)
+
+
+# ---------------
+# Batched delivery
+# ---------------
+
+class Batch(object):
+    """Context manager for a batch of events.  Batches may be
+    nested; events are delivered when the outermost one closes:
+
+        with Batch():
+            ... changes that notify listeners ...
+    """
+    depth = 0
+    # (listener id, coalesce key) -> (listener, event), in arrival order
+    pending: Dict[Tuple[int, object], Tuple[Listener, Event]] = {}
+
+    def __enter__(self) -> "Batch":
+        Batch.depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        Batch.depth -= 1
+        if Batch.depth == 0 and Batch.pending:
+            Batch.flush()
+
+    @staticmethod
+    def flush():
+        """Deliver the pending events, grouped by listener"""
+        pending = Batch.pending
+        Batch.pending = {}
+        by_listener: Dict[int, Tuple[Listener, List[Event]]] = {}
+        for (listener_id, _), (listener, event) in pending.items():
+            if listener_id not in by_listener:
+                by_listener[listener_id] = (listener, [])
+            by_listener[listener_id][1].append(event)
+        for listener, events in by_listener.values():
+            listener.notify_batch(events)
+
+
+def deliver(listener: Listener, event: Event):
+    """Notify listener of event now, or hold it for the
+    open batch if the listener takes batched delivery
+    """
+    if Batch.depth == 0 or not getattr(listener, "batched", True):
+        listener.notify(event)
+        return
+    key = event.coalesce_key()
+    if key is None:
+        key = object()
+    pending = Batch.pending
+    slot = (id(listener), key)
+    # Re-inserting keeps the position of the first event,
+    # so remove to move a coalesced event to the end
+    pending.pop(slot, None)
+    pending[slot] = (listener, event)
@@ -0,0 +1,311 @@
+"""
+Batch solving: solve every puzzle in a collection of files
+and directories in one process, streaming the results and
+keeping throughput and latency statistics.
+
+Puzzles are read lazily, one at a time, and a single board
+is reused for all of them, so memory use does not grow with
+the size of the collection (apart from one float per puzzle
+for the latency percentiles).
+
+Puzzles are solved a chunk at a time.  With more than one job,
+chunks are solved in a pool of worker processes.  Puzzles and
+results cross between processes as 81 character strings, in
+chunks, with a bounded number of chunks in flight; each worker
+reuses one board for all its puzzles.
+"""
+
+import os
+import sys
+import time
+import multiprocessing
+from array import array
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, TextIO, Tuple
+
+import sdk_board
+import sdk_io
+
+import logging
+logging.basicConfig()
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+
+# Files in a directory that are taken to hold puzzles
+PUZZLE_SUFFIXES = (".sdk", ".txt")
+
+
+def puzzle_files(paths: Iterable[str]) -> Iterator[str]:
+    """The puzzle files named by paths, expanding
+    directories to the puzzle files they contain
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.endswith(PUZZLE_SUFFIXES):
+                        yield os.path.join(dirpath, name)
+        else:
+            yield path
+
+
+def _label(path: str, number: int) -> str:
+    return "{}:{}".format(path, number + 1)
+
+
+# How a puzzle came out: solve may return a result with its own
+# status (as sdk_solver.solve does); else it is solved or not
+SOLVED = "solved"
+NOT_SOLVED = "not solved"
+GAVE_UP = "gave up"
+
+
+def _outcome_status(result: object, board: sdk_board.Board) -> str:
+    """The status of a puzzle given what solve returned for it"""
+    if result and board.is_solved():
+        return SOLVED
+    status = getattr(result, "status", NOT_SOLVED)
+    return NOT_SOLVED if status == SOLVED else status
+
+
+class Stats(object):
+    """Throughput and latency of a batch.  If averaged, the
+    latencies are each puzzle's share of the time for its chunk,
+    so only their mean means anything.
+    """
+
+    def __init__(self, averaged: bool = False):
+        self.averaged = averaged
+        self.latencies = array("d")
+        self.solved = 0
+        self.gave_up = 0
+        self.started = time.perf_counter()
+        self.finished = self.started
+
+    def record(self, seconds: float, status: str):
+        self.latencies.append(seconds)
+        if status == SOLVED:
+            self.solved += 1
+        elif status == GAVE_UP:
+            self.gave_up += 1
+        self.finished = time.perf_counter()
+
+    def percentile(self, p: float) -> float:
+        """Latency in seconds below which p percent of puzzles fall"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[rank]
+
+    def __str__(self) -> str:
+        count = len(self.latencies)
+        elapsed = self.finished - self.started
+        rate = count / elapsed if elapsed > 0 else 0.0
+        summary = ("{} puzzles ({} solved, {} gave up) in {:.3f}s: "
+                   "{:.1f} puzzles/sec, ".format(count, self.solved,
+                                                 self.gave_up, elapsed, rate))
+        if self.averaged:
+            mean = sum(self.latencies) / count if count else 0.0
+            return summary + "{:.3f}ms per puzzle (chunk average)".format(
+                1000 * mean)
+        return summary + "p50 {:.3f}ms, p99 {:.3f}ms".format(
+            1000 * self.percentile(50), 1000 * self.percentile(99))
+
+
+class Results(object):
+    """Where results go: either .sdk form, each board preceded by
+    a comment line so that the output can be read back with
+    sdk_io.read_all, or one solution per line.  Results written
+    out of input order carry their input position.
+    """
+
+    def __init__(self, out: TextIO, lines: bool = False,
+                 ordered: bool = True):
+        self.out = out
+        self.ordered = ordered
+        self.lines = sdk_io.LineWriter(out) if lines else None
+
+    def write(self, position: int, label: str, solution: str, status: str):
+        if self.lines is not None:
+            if not self.ordered:
+                solution = "{} {}".format(position, solution)
+            self.lines.write(solution)
+            return
+        if not self.ordered:
+            label = "{} {}".format(position, label)
+        out = self.out
+        out.write("# {} {}\n".format(label, status))
+        for row in sdk_io.line_rows(solution):
+            out.write(row)
+            out.write("\n")
+        out.write("\n")
+
+    def flush(self):
+        if self.lines is not None:
+            self.lines.flush()
+        self.out.flush()
+
+
+def run(paths: Iterable[str], solve: Callable, out: TextIO = sys.stdout,
+        jobs: int = 1, ordered: bool = True, chunk_size: int = 64,
+        lines: bool = False, start: int = 0,
+        vectorized: bool = False) -> Stats:
+    """Solve each puzzle in paths with solve, writing
+    results to out as they are found, one per line if lines.
+    With jobs > 1, use that many worker processes.  Unless ordered,
+    results are written as workers finish them, labeled with their
+    position in the input.  Puzzles before position start are
+    skipped, e.g., to resume an interrupted batch.
+
+    solve normally takes a board and solves it in place.  If
+    vectorized, it instead takes a list of puzzles in the one-line
+    format and returns (solution, solved) for each, and is given
+    a chunk of puzzles at a time.
+    """
+    results = Results(out, lines, ordered or jobs == 1)
+    if jobs > 1:
+        stats = _run_pool(paths, solve, vectorized, results, jobs,
+                          chunk_size, start)
+    else:
+        stats = Stats(vectorized)
+        _init_engine(solve, vectorized)
+        for labels, task, task_args in _tasks(paths, chunk_size, start):
+            _finish(labels, task(*task_args), stats, results)
+    results.flush()
+    return stats
+
+
+def _finish(labels: List[str], outcomes: List["Outcome"], stats: Stats,
+            results: Results):
+    for label, (position, solution, status, seconds) in zip(labels, outcomes):
+        stats.record(seconds, status)
+        results.write(position, label, solution, status)
+
+
+# ----------------------------
+# Solving chunks, in this process or in workers
+# ----------------------------
+
+# Per-process solving state
+_engine_board = None
+_engine_solve = None
+_engine_vectorized = False
+_engine_corpora: Dict[str, sdk_io.Corpus] = {}
+
+# (position in input, puzzle or solution as 81 characters)
+Job = Tuple[int, str]
+# (position, solution, status, seconds)
+Outcome = Tuple[int, str, str, float]
+
+
+def _init_engine(solve: Callable, vectorized: bool):
+    global _engine_board, _engine_solve, _engine_vectorized
+    _engine_board = sdk_board.Board()
+    _engine_solve = solve
+    _engine_vectorized = vectorized
+    # Per-guess progress messages would swamp the results
+    logging.getLogger("sdk_solver").setLevel(logging.WARNING)
+
+
+def _solve_chunk(chunk: List[Job]) -> List[Outcome]:
+    """Solve a chunk of puzzles"""
+    if _engine_vectorized:
+        start = time.perf_counter()
+        answers = _engine_solve([puzzle for _, puzzle in chunk])
+        # Each puzzle is charged an equal share
+        seconds = (time.perf_counter() - start) / max(1, len(chunk))
+        return [(position, solution, SOLVED if solved else NOT_SOLVED, seconds)
+                for (position, _), (solution, solved) in zip(chunk, answers)]
+    return [_solve_one(position, puzzle) for position, puzzle in chunk]
+
+
+def _solve_range(position: int, path: str, first: int,
+                 stop: int) -> List[Outcome]:
+    """Solve puzzles first..stop-1 of a fixed-width file,
+    reading them from this process's own map of the file.
+    The first is at position in the input.
+    """
+    if path not in _engine_corpora:
+        _engine_corpora[path] = sdk_io.Corpus(path)
+    corpus = _engine_corpora[path][first:stop]
+    return _solve_chunk([(position + i, corpus[i])
+                         for i in range(len(corpus))])
+
+
+def _solve_one(position: int, puzzle: str) -> Outcome:
+    board = _engine_board
+    start = time.perf_counter()
+    board.set_tiles(sdk_io.line_rows(puzzle))
+    status = _outcome_status(_engine_solve(board), board)
+    return (position, sdk_io.as_line(board), status,
+            time.perf_counter() - start)
+
+
+def _tasks(paths: Iterable[str], chunk_size: int, start: int
+           ) -> Iterator[Tuple[List[str], Callable, tuple]]:
+    """Labels, worker function, and its arguments for successive
+    chunks of puzzles.  Chunks of a fixed-width file are sent as
+    index ranges; other puzzles are sent as strings.
+    """
+    labels = []
+    chunk = []
+    position = 0
+    for path in puzzle_files(paths):
+        if sdk_io.is_corpus(path):
+            if chunk:
+                yield labels, _solve_chunk, (chunk,)
+                labels = []
+                chunk = []
+            with sdk_io.Corpus(path) as corpus:
+                count = len(corpus)
+            for first in range(max(0, start - position), count, chunk_size):
+                stop = min(count, first + chunk_size)
+                yield ([_label(path, i) for i in range(first, stop)],
+                       _solve_range, (position + first, path, first, stop))
+            position += count
+            continue
+        for number, rows in enumerate(sdk_io.read_all(path)):
+            if position >= start:
+                labels.append(_label(path, number))
+                chunk.append((position, "".join(rows)))
+                if len(chunk) == chunk_size:
+                    yield labels, _solve_chunk, (chunk,)
+                    labels = []
+                    chunk = []
+            position += 1
+    if chunk:
+        yield labels, _solve_chunk, (chunk,)
+
+
+def _run_pool(paths: Iterable[str], solve: Callable, vectorized: bool,
+              results: Results, jobs: int, chunk_size: int,
+              start: int) -> Stats:
+    stats = Stats(vectorized)
+    # Enough chunks in flight to keep every worker busy,
+    # but not so many that the input piles up in memory
+    window = 4 * jobs
+    in_flight = deque()
+
+    def finish_one():
+        if not results.ordered:
+            # Any finished chunk will do; else wait for the oldest
+            for entry in in_flight:
+                if entry[1].ready():
+                    in_flight.remove(entry)
+                    _finish(entry[0], entry[1].get(), stats, results)
+                    return
+        labels, result = in_flight.popleft()
+        _finish(labels, result.get(), stats, results)
+
+    with multiprocessing.Pool(jobs, initializer=_init_engine,
+                              initargs=(solve, vectorized)) as pool:
+        for labels, task, task_args in _tasks(paths, chunk_size, start):
+            if len(in_flight) >= window:
+                finish_one()
+            in_flight.append((labels, pool.apply_async(task, task_args)))
+        while in_flight:
+            finish_one()
+    return stats
@@ -0,0 +1,91 @@
+"""
+Benchmark of solver settings: for each puzzle and each
+setting in CONFIGS, the number of search nodes (guesses)
+and the best time to solve over several runs (the best
+rather than the mean, since it is least disturbed by
+whatever else the machine is doing).  The totals for each
+setting over all the puzzles follow, to pick the best
+setting for a corpus.
+
+    python3 sdk_bench.py                      # veryhard and evil
+    python3 sdk_bench.py -r 50 data/*.sdk
+"""
+
+import argparse
+import time
+from typing import Dict, List, Tuple
+
+from sdk_board import Board
+import sdk_io
+import sdk_solver
+
+import logging
+logging.basicConfig()
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+# (name, keyword arguments for sdk_solver.solve)
+CONFIGS: List[Tuple[str, Dict]] = [
+    ("singles", {}),
+    ("probe", {"probe": True}),
+    ("subsets 2", {"subsets": 2}),
+    ("subsets 3", {"subsets": 3}),
+    ("subsets 4", {"subsets": 4}),
+    ("intersections", {"intersections": True}),
+    ("inter+pairs", {"intersections": True, "subsets": 2}),
+    ("fish 4", {"fish": 4}),
+    ("no chains", {"intersections": True, "subsets": 2, "fish": 4}),
+    ("all", {"intersections": True, "subsets": 2, "fish": 4,
+             "chains": True}),
+    ("pairs+probe", {"intersections": True, "subsets": 2, "probe": True}),
+    ("mrv-degree", {"choose": "mrv-degree"}),
+    ("unit", {"choose": "unit"}),
+    ("lcv", {"order": "lcv"}),
+    ("random", {"order": "random", "seed": 1}),
+]
+
+DEFAULT_PUZZLES = ["data/veryhard.sdk", "data/evil.sdk"]
+
+
+def measure(puzzle: List[str], options: Dict,
+            repeat: int) -> Tuple[int, float, bool]:
+    """(nodes, best seconds, solved) solving puzzle repeat times"""
+    board = Board()
+    best = float("inf")
+    for _ in range(repeat):
+        board.set_tiles(puzzle)
+        stats = sdk_solver.SearchStats()
+        start = time.perf_counter()
+        solved = sdk_solver.solve(board, stats=stats, **options)
+        best = min(best, time.perf_counter() - start)
+    return stats.nodes, best, solved and board.is_solved()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solver benchmark")
+    parser.add_argument("-r", "--repeat", help="Solves per measurement",
+                        type=int, default=10)
+    parser.add_argument("files", nargs="*", metavar="file",
+                        default=DEFAULT_PUZZLES)
+    args = parser.parse_args()
+    logging.getLogger("sdk_solver").setLevel(logging.WARNING)
+    print("{:24} {:14} {:>8} {:>10}".format("puzzle", "setting",
+                                          "nodes", "ms"))
+    totals = {setting: [0, 0.0] for setting, _ in CONFIGS}
+    for path in args.files:
+        for number, puzzle in enumerate(sdk_io.read_all(path)):
+            name = path if number == 0 else "{}:{}".format(path, number + 1)
+            for setting, options in CONFIGS:
+                nodes, seconds, solved = measure(puzzle, options, args.repeat)
+                totals[setting][0] += nodes
+                totals[setting][1] += seconds
+                print("{:24} {:14} {:>8} {:>10.2f}{}".format(
+                    name, setting, nodes, 1000 * seconds,
+                    "" if solved else "  not solved"))
+    for setting, (nodes, seconds) in totals.items():
+        print("{:24} {:14} {:>8} {:>10.2f}".format(
+            "total", setting, nodes, 1000 * seconds))
+
+
+if __name__ == "__main__":
+    main()
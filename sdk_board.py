@@ -7,11 +7,14 @@ exactly one occurrence of each of the 9 symbols
 on the board.
 """
 
-from typing import List
+from typing import List, Optional, Tuple, Union
+from array import array
 
 from events import Event, Listener
-from sdk_tile import Tile, UNKNOWN
-from sdk_group import Group
+from sdk_tile import Tile, UNKNOWN, CHOICES, BIT, ALL_CANDIDATES
+from sdk_tile import POPCOUNT, MASK_CHOICES
+from sdk_group import Group, Intersection
+from sdk_topology import NUNITS, UNIT_CELLS, INTERSECTIONS
 
 import logging
 logging.basicConfig()
@@ -38,10 +41,129 @@ class BoardListener(Listener):
         raise NotImplementedError(
             "BoardListener subclass needs to override notify(BoardEvent)")
 
+# ------------------------------
+#  Binary form
+# ------------------------------
+
+# Boards can be saved in two compact binary forms:
+#  - values only, a 4-bit code per tile, two tiles to a byte
+#    (first tile in the high bits): 0 for UNKNOWN, else the
+#    position of the value in CHOICES plus one;
+#  - full candidate state, the 81 9-bit candidate masks as one
+#    little-endian integer, first tile in the lowest bits.
+VALUES_SIZE = 41
+CANDIDATES_SIZE = 92
+
+_VALUE_CODE = {UNKNOWN: 0}
+_VALUE_CODE.update({choice: code + 1 for code, choice in enumerate(CHOICES)})
+_CODE_VALUE = [UNKNOWN] + CHOICES
+
+Bytes = Union[bytes, bytearray, memoryview]
+
+
+def _pack_codes(codes: List[int]) -> bytes:
+    """81 value codes, two to a byte"""
+    return bytes((codes[i] << 4) | codes[i + 1] for i in range(0, 80, 2)) \
+        + bytes((codes[80] << 4,))
+
+
+def _unpack_codes(data: Bytes) -> List[int]:
+    """81 value codes from their packed form"""
+    if len(data) < VALUES_SIZE:
+        raise ValueError("Packed board too short")
+    codes = []
+    for i in range(VALUES_SIZE):
+        byte = data[i]
+        codes.append(byte >> 4)
+        codes.append(byte & 0xF)
+    codes = codes[:81]
+    if max(codes) >= len(_CODE_VALUE):
+        raise ValueError("Packed board has an invalid value code")
+    return codes
+
+
+def _pack_masks(masks: List[int]) -> bytes:
+    packed = 0
+    for mask in reversed(masks):
+        packed = (packed << 9) | mask
+    return packed.to_bytes(CANDIDATES_SIZE, "little")
+
+
+def _unpack_masks(data: Bytes) -> List[int]:
+    if len(data) < CANDIDATES_SIZE:
+        raise ValueError("Packed candidates too short")
+    packed = int.from_bytes(data[:CANDIDATES_SIZE], "little")
+    masks = []
+    for _ in range(81):
+        masks.append(packed & ALL_CANDIDATES)
+        packed >>= 9
+    return masks
+
+
+def _mask_value(mask: int) -> str:
+    """The value of a tile with these candidates"""
+    return MASK_CHOICES[mask][0] if POPCOUNT[mask] == 1 else UNKNOWN
+
+
 # ------------------------------
 #  Board class
 # ------------------------------
 
+# A journal entry records a tile and its value and
+# candidate mask before a change
+JournalEntry = Tuple[Tile, str, int]
+
+
+class Occurrences(object):
+    """Where each value can still go, by row and by column.
+    rows[v][r] is a mask of the columns c (bit 1 << c) where
+    row r still has CHOICES[v] as a candidate, and cols[v][c]
+    likewise a mask of rows.  Brought up to date from the
+    board's journal by catch_up, and kept up to date by
+    Board.undo once in use, so tactics that need them (see
+    sdk_solver.basic_fish) do not rescan the board every time.
+    """
+    __slots__ = ("rows", "cols", "seen", "valid")
+
+    def __init__(self):
+        self.rows = [[0] * 9 for _ in CHOICES]
+        self.cols = [[0] * 9 for _ in CHOICES]
+        # How much of the journal is reflected here
+        self.seen = 0
+        self.valid = False
+
+    def invalidate(self):
+        """The board has changed without the journal knowing"""
+        self.valid = False
+
+    def catch_up(self, board: "Board"):
+        """Account for changes to board since the last catch_up"""
+        journal = board.journal
+        if not self.valid:
+            for row in board.tiles:
+                for tile in row:
+                    self.update(tile)
+            self.valid = True
+        else:
+            for tile in {entry[0] for entry in journal[self.seen:]}:
+                self.update(tile)
+        self.seen = len(journal)
+
+    def update(self, tile: Tile):
+        """Account for the current candidates of tile"""
+        row, col, mask = tile.row, tile.col, tile.mask
+        row_bit = 1 << row
+        col_bit = 1 << col
+        rows = self.rows
+        cols = self.cols
+        for v in range(len(CHOICES)):
+            if mask & (1 << v):
+                rows[v][row] |= col_bit
+                cols[v][col] |= row_bit
+            else:
+                rows[v][row] &= ~col_bit
+                cols[v][col] &= ~row_bit
+
 
 class Board(object):
     """A board has a matrix of tiles indexed 0..9, 0..9"""
@@ -50,51 +172,41 @@ class Board(object):
         """The empty board"""
         # Row/Column structure: Each row contains columns
         self.tiles: List[List[Tile]] = []
+        # Changes to tiles since set_tiles, in order (see Tile)
+        self.journal: List[JournalEntry] = []
+        # Per-value index of candidates, built when first needed
+        self.occurrences = Occurrences()
+        # The chain tactics' link graph (see sdk_chains), if wanted
+        self.links = None
         for row in range(9):
             cols = []
             for col in range(9):
-                cols.append(Tile(row, col))
+                tile = Tile(row, col)
+                tile.journal = self.journal
+                cols.append(tile)
             self.tiles.append(cols)
 
         self.groups = []
+        self._intersections: Optional[List[Intersection]] = None
         self._form_groups()
 
     def _form_groups(self):
-        """Build a group for each row, column, and block """
-        self._build_row_groups()
-        self._build_column_groups()
-        self._build_block_groups()
-
-    def _build_row_groups(self):
-        """Add a group for each row"""
-        for row_index in range(9):
-            row_group = Group("Row {}".format(row_index + 1))
-            for col_index in range(9):
-                row_group.add(self.tiles[row_index][col_index])
-            self.groups.append(row_group)
-
-    def _build_column_groups(self):
-        """Add a group for each column"""
-        for col_index in range(9):
-            col_group = Group("Column {}".format(col_index))
-            for row_index in range(9):
-                col_group.add(self.tiles[row_index][col_index])
-            self.groups.append(col_group)
-
-    def _build_block_groups(self):
-        """Add a group for each 3x3 block"""
-        for row_group in range(3):
-            for col_group in range(3):
-                block_group = Group("Block from {},{}"
-                                    .format(row_group, col_group))
-                row_base = 3 * row_group
-                col_base = 3 * col_group
-                for row_offset in range(3):
-                    for col_offset in range(3):
-                        tile_row = row_base + row_offset
-                        tile_col = col_base + col_offset
-                        block_group.add(self.tiles[tile_row][tile_col])
-                self.groups.append(block_group)
+        """Build a group for each row, column, and block,
+        following the precomputed unit table in sdk_topology
+        """
+        flat = [tile for row in self.tiles for tile in row]
+        for unit in range(NUNITS):
+            self.groups.append(Group.for_unit(unit, flat))
+
+    @property
+    def intersections(self) -> List[Intersection]:
+        """Where blocks meet rows and columns, created on first use"""
+        if self._intersections is None:
+            flat = [tile for row in self.tiles for tile in row]
+            self._intersections = [
+                Intersection.for_intersection(k, self.groups, flat)
+                for k in range(len(INTERSECTIONS))]
+        return self._intersections
 
     def set_tiles(self, tile_values: List[str]):
         """Set the tile values a list of lists or a list of strings"""
@@ -102,6 +214,61 @@ class Board(object):
             for col_num in range(9):
                 tile = self.tiles[row_num][col_num]
                 tile.set_value(tile_values[row_num][col_num])
+        # A fresh start: nothing before this is worth tracking
+        del self.journal[:]
+        self.occurrences.invalidate()
+
+    def checkpoint(self) -> int:
+        """A point in the journal that undo can roll back to.
+        Checkpoints are good until the next set_tiles.
+        """
+        return len(self.journal)
+
+    def undo(self, checkpoint: int):
+        """Roll back every change to the tiles since checkpoint,
+        most recent first.  Cost is proportional to the number
+        of changes, not the size of the board.
+        """
+        journal = self.journal
+        occurrences = self.occurrences
+        while len(journal) > checkpoint:
+            tile, value, mask = journal.pop()
+            tile.restore(value, mask)
+            if occurrences.valid:
+                occurrences.update(tile)
+        occurrences.seen = min(occurrences.seen, len(journal))
+
+    def dump_values(self) -> bytes:
+        """The tile values in VALUES_SIZE bytes"""
+        return _pack_codes([_VALUE_CODE[tile.value]
+                            for row in self.tiles for tile in row])
+
+    def load_values(self, data: Bytes):
+        """Set the tile values from the result of dump_values.
+        Like set_tiles, this resets the candidates of unknown tiles.
+        """
+        codes = _unpack_codes(data)
+        for row in self.tiles:
+            for tile in row:
+                tile.set_value(_CODE_VALUE[codes[tile.index]])
+        del self.journal[:]
+        self.occurrences.invalidate()
+
+    def dump_candidates(self) -> bytes:
+        """Candidates of every tile in CANDIDATES_SIZE bytes"""
+        return _pack_masks([tile.mask for row in self.tiles for tile in row])
+
+    def load_candidates(self, data: Bytes):
+        """Restore the result of dump_candidates.  Tiles with a
+        single candidate get it as their value.
+        """
+        masks = _unpack_masks(data)
+        for row in self.tiles:
+            for tile in row:
+                mask = masks[tile.index]
+                tile.restore(_mask_value(mask), mask)
+        del self.journal[:]
+        self.occurrences.invalidate()
 
     def as_list(self) -> List[str]:
         """Get tile values in a format for printing or for
@@ -145,3 +312,223 @@ class Board(object):
 
     def __str__(self) -> str:
         return "\n".join(self.as_list())
+
+
+# ------------------------------
+#  Array-backed board
+# ------------------------------
+
+_UNKNOWN_CODE = ord(UNKNOWN)
+
+
+class FlatBoard(object):
+    """Same interface as Board, but the values and candidate masks
+    of all 81 tiles are kept in two flat arrays indexed by
+    row * 9 + col.  Tile and Group objects are created only when
+    someone asks for them (a view component attaching listeners,
+    or a tactic that works group by group); until then a board is
+    two small arrays.
+    """
+    __slots__ = ("values", "masks", "journal", "occurrences", "links",
+                 "_tiles", "_groups", "_intersections")
+
+    def __init__(self):
+        """The empty board"""
+        # Values are the ASCII codes of UNKNOWN or a CHOICES symbol
+        self.values = bytearray(UNKNOWN * 81, "ascii")
+        self.masks = array("H", [ALL_CANDIDATES]) * 81
+        self.journal: List[JournalEntry] = []
+        self.occurrences = Occurrences()
+        self.links = None
+        self._tiles: Optional[List[List["FlatTile"]]] = None
+        self._groups: Optional[List[Group]] = None
+        self._intersections: Optional[List[Intersection]] = None
+
+    @property
+    def tiles(self) -> List[List["FlatTile"]]:
+        """Tile views of the arrays, created on first use"""
+        if self._tiles is None:
+            self._tiles = [[FlatTile(self, row, col) for col in range(9)]
+                           for row in range(9)]
+        return self._tiles
+
+    @property
+    def groups(self) -> List[Group]:
+        """Row, column, and block groups, created on first use"""
+        if self._groups is None:
+            flat = [tile for row in self.tiles for tile in row]
+            self._groups = [Group.for_unit(unit, flat)
+                            for unit in range(NUNITS)]
+        return self._groups
+
+    @property
+    def intersections(self) -> List[Intersection]:
+        """Where blocks meet rows and columns, created on first use"""
+        if self._intersections is None:
+            flat = [tile for row in self.tiles for tile in row]
+            self._intersections = [
+                Intersection.for_intersection(k, self.groups, flat)
+                for k in range(len(INTERSECTIONS))]
+        return self._intersections
+
+    def copy(self) -> "FlatBoard":
+        """A board with the same values and candidates.  Listeners
+        are not copied.
+        """
+        other = FlatBoard.__new__(FlatBoard)
+        other.values = self.values[:]
+        other.masks = self.masks[:]
+        other.journal = []
+        other.occurrences = Occurrences()
+        other.links = None
+        other._tiles = None
+        other._groups = None
+        other._intersections = None
+        return other
+
+    def set_tiles(self, tile_values: List[str]):
+        """Set the tile values a list of lists or a list of strings"""
+        self.occurrences.invalidate()
+        if self._tiles is not None:
+            # Someone may be listening; go through the tiles
+            for row in self._tiles:
+                for tile in row:
+                    tile.set_value(tile_values[tile.row][tile.col])
+            del self.journal[:]
+            return
+        values = self.values
+        masks = self.masks
+        for row_num in range(9):
+            row_values = tile_values[row_num]
+            for col_num in range(9):
+                value = row_values[col_num]
+                index = row_num * 9 + col_num
+                if value in CHOICES:
+                    values[index] = ord(value)
+                    masks[index] = BIT[value]
+                else:
+                    values[index] = _UNKNOWN_CODE
+                    masks[index] = ALL_CANDIDATES
+
+    # Journal handling is the same as for Board; note that
+    # changes made by set_tiles before any tile exists are
+    # never journaled.
+    checkpoint = Board.checkpoint
+    undo = Board.undo
+
+    def as_list(self) -> List[str]:
+        """Get tile values in a format for printing or for
+        saving and later restoring with set_tiles
+        """
+        text = self.values.decode("ascii")
+        return [text[base:base + 9] for base in range(0, 81, 9)]
+
+    def dump_values(self) -> bytes:
+        """The tile values in VALUES_SIZE bytes"""
+        return _pack_codes([_VALUE_CODE[chr(code)] for code in self.values])
+
+    def load_values(self, data: Bytes):
+        """Set the tile values from the result of dump_values.
+        Like set_tiles, this resets the candidates of unknown tiles.
+        """
+        self.occurrences.invalidate()
+        if self._tiles is not None:
+            Board.load_values(self, data)
+            return
+        for index, code in enumerate(_unpack_codes(data)):
+            value = _CODE_VALUE[code]
+            self.values[index] = ord(value)
+            self.masks[index] = (ALL_CANDIDATES if value == UNKNOWN
+                                 else BIT[value])
+
+    def dump_candidates(self) -> bytes:
+        """Candidates of every tile in CANDIDATES_SIZE bytes"""
+        return _pack_masks(self.masks)
+
+    def load_candidates(self, data: Bytes):
+        """Restore the result of dump_candidates.  Tiles with a
+        single candidate get it as their value.
+        """
+        self.occurrences.invalidate()
+        if self._tiles is not None:
+            Board.load_candidates(self, data)
+            return
+        for index, mask in enumerate(_unpack_masks(data)):
+            self.values[index] = ord(_mask_value(mask))
+            self.masks[index] = mask
+
+    def unit_values(self, unit: int) -> str:
+        """Values of a row (0..8), column (9..17), or
+        block (18..26), in the order of Board.groups
+        """
+        values = self.values
+        return "".join(chr(values[cell]) for cell in UNIT_CELLS[unit])
+
+    def is_consistent(self) -> bool:
+        """All the constraints are satisfied, so far"""
+        values = self.values
+        masks = self.masks
+        for cells in UNIT_CELLS:
+            can_place = 0
+            used = 0
+            for cell in cells:
+                mask = masks[cell]
+                if mask == 0:
+                    return False
+                if values[cell] != _UNKNOWN_CODE:
+                    bit = BIT[chr(values[cell])]
+                    if used & bit:
+                        return False
+                    used |= bit
+                can_place |= mask
+            if can_place != ALL_CANDIDATES:
+                return False
+        return True
+
+    def duplicates(self) -> List[str]:
+        """A list of duplicates found in groups"""
+        reports = []
+        for group in self.groups:
+            reports = reports + group.duplicates()
+        return reports
+
+    def is_solved(self) -> bool:
+        """True if every tile has a value and no constraint is violated"""
+        if _UNKNOWN_CODE in self.values:
+            return False
+        return self.is_consistent()
+
+    def __str__(self) -> str:
+        return "\n".join(self.as_list())
+
+
+class FlatTile(Tile):
+    """A tile whose value and candidates live in the
+    arrays of a FlatBoard
+    """
+    __slots__ = ("board",)
+
+    def __init__(self, board: FlatBoard, row: int, col: int):
+        self.board = board
+        self.index = row * 9 + col
+        self.row = row
+        self.col = col
+        self.listeners = []
+        self.scanners = []
+        self.journal = board.journal
+
+    @property
+    def value(self) -> str:
+        return chr(self.board.values[self.index])
+
+    @value.setter
+    def value(self, value: str):
+        self.board.values[self.index] = ord(value)
+
+    @property
+    def mask(self) -> int:
+        return self.board.masks[self.index]
+
+    @mask.setter
+    def mask(self, mask: int):
+        self.board.masks[self.index] = mask
@@ -0,0 +1,398 @@
+"""
+Chain tactics: reasoning along links between candidates.
+
+A candidate is a (cell, value) pair, numbered cell * 9 + v
+where v is the position of the value in CHOICES.  Two
+candidates are weakly linked if they can't both be true (same
+cell, or same value in cells that share a unit), and strongly
+linked if they can't both be false (the only two candidates
+of a cell, or the only two places for a value in a unit).
+
+Following links from an assumption gives a chain of
+consequences: a true candidate makes its weak partners false,
+and a false one makes its strong partners true.  We look for
+  - nice loops: assuming a candidate leads back to its opposite,
+    so the assumption was wrong;
+  - forcing chains: every way of filling a cell, and both truth
+    values of a candidate, lead to the same consequence, so that
+    consequence holds.
+
+The link graph is kept up to date as candidates are eliminated
+(or restored, when the search backs up), adding and removing
+only the links of the candidates that changed.  The search stops
+when it has followed a budget of links, so that whether it finds
+a deduction depends only on the puzzle (as a rating must), and
+it can also be given a time limit where an answer is needed
+quickly (or not at all).
+"""
+
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sdk_board import Board
+import sdk_tile
+from sdk_topology import NCELLS, CELL_UNITS, PEERS, UNIT_CELLS
+
+import logging
+logging.basicConfig()
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+NVALUES = len(sdk_tile.CHOICES)
+NCANDIDATES = NCELLS * NVALUES
+
+# Default work budget for one search: the number of steps
+# followed by implications (about 50 ms at a million a second)
+BUDGET = 50000
+
+# A step of a chain: (candidate, True if it is on)
+Step = Tuple[int, bool]
+
+
+def describe(candidate: int) -> str:
+    """A candidate as r<row>c<col>=<value>, counting from 1"""
+    cell, v = divmod(candidate, NVALUES)
+    return "r{}c{}={}".format(cell // 9 + 1, cell % 9 + 1,
+                              sdk_tile.CHOICES[v])
+
+
+class Deduction(object):
+    """What a chain search found: candidates to eliminate and
+    candidates to place, and the chain(s) that show why
+    """
+
+    def __init__(self, kind: str, eliminate: List[int], place: List[int],
+                 chains: List[List[Step]]):
+        self.kind = kind
+        self.eliminate = eliminate
+        self.place = place
+        self.chains = chains
+
+    def apply(self, board: Board) -> bool:
+        """Make the deduction on board.  Returns True iff
+        something changed.
+        """
+        tiles = [tile for row in board.tiles for tile in row]
+        changed = False
+        for candidate in self.eliminate:
+            cell, v = divmod(candidate, NVALUES)
+            changed = tiles[cell].eliminate_mask(1 << v) or changed
+        for candidate in self.place:
+            cell, v = divmod(candidate, NVALUES)
+            tile = tiles[cell]
+            changed = tile.eliminate_mask(tile.mask & ~(1 << v)) or changed
+        return changed
+
+    def __str__(self) -> str:
+        found = (["not " + describe(c) for c in self.eliminate]
+                 + [describe(c) for c in self.place])
+        lines = ["{}: {}".format(self.kind, ", ".join(found))]
+        for chain in self.chains:
+            lines.append("  " + " => ".join(
+                ("" if on else "not ") + describe(candidate)
+                for candidate, on in chain))
+        return "\n".join(lines)
+
+
+class LinkGraph(object):
+    """Strong and weak links among the candidates of a board.
+    weak[c] and strong[c] are the candidates linked to c;
+    strong links are counted, since two candidates can be
+    strongly linked for more than one reason (a cell and a unit).
+    """
+
+    def __init__(self, board: Board):
+        self.board = board
+        self.tiles = [tile for row in board.tiles for tile in row]
+        self.alive = bytearray(NCANDIDATES)
+        # Candidates of each cell as the graph has them
+        self.masks = [0] * NCELLS
+        self.weak: List[Set[int]] = [set() for _ in range(NCANDIDATES)]
+        self.strong: List[Dict[int, int]] = [{} for _ in range(NCANDIDATES)]
+        # The strong link due to each cell, and to each (unit, value)
+        self.cell_pair: List[Optional[Tuple[int, int]]] = [None] * NCELLS
+        self.unit_pair: List[Optional[Tuple[int, int]]] = \
+            [None] * (len(UNIT_CELLS) * NVALUES)
+        # How much of the journal is reflected here
+        self.seen = 0
+        self.last = None
+        # Steps followed by the current (or last) find
+        self.work = 0
+        self.rebuild()
+
+    # ---------------------------------
+    # Keeping the graph up to date
+    # ---------------------------------
+
+    def rebuild(self):
+        """Build the graph from scratch"""
+        self.alive = bytearray(NCANDIDATES)
+        self.masks = [0] * NCELLS
+        for candidate in range(NCANDIDATES):
+            self.weak[candidate].clear()
+            self.strong[candidate].clear()
+        alive = self.alive
+        for tile in self.tiles:
+            self.masks[tile.index] = tile.mask
+            for v in range(NVALUES):
+                if tile.mask & (1 << v):
+                    alive[tile.index * NVALUES + v] = 1
+        for candidate in range(NCANDIDATES):
+            if alive[candidate]:
+                cell, v = divmod(candidate, NVALUES)
+                weak = self.weak[candidate]
+                base = cell * NVALUES
+                for other in range(base, base + NVALUES):
+                    if other != candidate and alive[other]:
+                        weak.add(other)
+                for peer in PEERS[cell]:
+                    if alive[peer * NVALUES + v]:
+                        weak.add(peer * NVALUES + v)
+        self.cell_pair = [None] * NCELLS
+        self.unit_pair = [None] * (len(UNIT_CELLS) * NVALUES)
+        for cell in range(NCELLS):
+            self._relink_cell(cell)
+        for unit in range(len(UNIT_CELLS)):
+            for v in range(NVALUES):
+                self._relink_unit(unit, v)
+        self._update(())
+
+    def refresh(self):
+        """Catch up with changes to the board since the graph was
+        last brought up to date.  Normally the journal says which
+        tiles have changed; if it has been rolled back (or cleared
+        for a new puzzle) we compare every tile instead.
+        """
+        journal = self.board.journal
+        if 0 < self.seen <= len(journal) and journal[self.seen - 1] is self.last:
+            self._update({entry[0] for entry in journal[self.seen:]})
+        else:
+            self._update(self.tiles)
+
+    def _update(self, tiles: Iterable[sdk_tile.Tile]):
+        """Add and remove candidates to match the masks of tiles"""
+        for tile in tiles:
+            cell = tile.index
+            old = self.masks[cell]
+            if old == tile.mask:
+                continue
+            self.masks[cell] = tile.mask
+            for v in range(NVALUES):
+                bit = 1 << v
+                if tile.mask & bit and not old & bit:
+                    self._add(cell * NVALUES + v)
+                elif old & bit and not tile.mask & bit:
+                    self._remove(cell * NVALUES + v)
+        journal = self.board.journal
+        self.seen = len(journal)
+        self.last = journal[-1] if journal else None
+
+    def _add(self, candidate: int):
+        """Candidate has become possible (again)"""
+        alive = self.alive
+        alive[candidate] = 1
+        cell, v = divmod(candidate, NVALUES)
+        weak = self.weak[candidate]
+        base = cell * NVALUES
+        others = [other for other in range(base, base + NVALUES)
+                  if other != candidate]
+        others.extend(peer * NVALUES + v for peer in PEERS[cell])
+        for other in others:
+            if alive[other]:
+                weak.add(other)
+                self.weak[other].add(candidate)
+        self._relink_cell(cell)
+        for unit in CELL_UNITS[cell]:
+            self._relink_unit(unit, v)
+
+    def _remove(self, candidate: int):
+        """Candidate has been eliminated"""
+        self.alive[candidate] = 0
+        for other in self.weak[candidate]:
+            self.weak[other].discard(candidate)
+        self.weak[candidate].clear()
+        cell, v = divmod(candidate, NVALUES)
+        self._relink_cell(cell)
+        for unit in CELL_UNITS[cell]:
+            self._relink_unit(unit, v)
+
+    def _relink_cell(self, cell: int):
+        base = cell * NVALUES
+        found = [c for c in range(base, base + NVALUES) if self.alive[c]]
+        self._set_pair(self.cell_pair, cell,
+                       tuple(found) if len(found) == 2 else None)
+
+    def _relink_unit(self, unit: int, v: int):
+        alive = self.alive
+        found = [cell * NVALUES + v for cell in UNIT_CELLS[unit]
+                 if alive[cell * NVALUES + v]]
+        self._set_pair(self.unit_pair, unit * NVALUES + v,
+                       tuple(found) if len(found) == 2 else None)
+
+    def _set_pair(self, table: list, key: int, pair: Optional[Tuple[int, int]]):
+        old = table[key]
+        if old == pair:
+            return
+        strong = self.strong
+        if old is not None:
+            a, b = old
+            for x, y in ((a, b), (b, a)):
+                if strong[x].get(y, 0) <= 1:
+                    strong[x].pop(y, None)
+                else:
+                    strong[x][y] -= 1
+        if pair is not None:
+            a, b = pair
+            strong[a][b] = strong[a].get(b, 0) + 1
+            strong[b][a] = strong[b].get(a, 0) + 1
+        table[key] = pair
+
+    # ---------------------------------
+    # Following chains
+    # ---------------------------------
+
+    def implications(self, start: int, on: bool
+                     ) -> Tuple[Dict[Step, Optional[Step]], Optional[int]]:
+        """Everything that follows from assuming start is on (or
+        off), as a map from each step reached to the step it came
+        from, and a candidate found to be both on and off if the
+        assumption leads to a contradiction (else None).
+        """
+        reached: Dict[Step, Optional[Step]] = {(start, on): None}
+        pending = deque([(start, on)])
+        weak = self.weak
+        strong = self.strong
+        while pending:
+            self.work += 1
+            step = pending.popleft()
+            candidate, state = step
+            if (candidate, not state) in reached:
+                return reached, candidate
+            following = weak[candidate] if state else strong[candidate]
+            for other in following:
+                if (other, not state) not in reached:
+                    reached[(other, not state)] = step
+                    pending.append((other, not state))
+                    if (other, state) in reached:
+                        return reached, other
+        return reached, None
+
+    @staticmethod
+    def chain(reached: Dict[Step, Optional[Step]], step: Step) -> List[Step]:
+        """The chain of steps from the assumption to step"""
+        steps = []
+        while step is not None:
+            steps.append(step)
+            step = reached[step]
+        steps.reverse()
+        return steps
+
+    def find(self, budget: int = BUDGET, seconds: float = None,
+             check: Callable[[], None] = None) -> Optional[Deduction]:
+        """The first deduction found by chains, or None if there
+        is none or budget steps have been followed first (or, if
+        given, seconds have passed).  check, if given, is called
+        before each cell is tried, and may raise to stop the search.
+        """
+        self.refresh()
+        self.work = 0
+        deadline = None if seconds is None else time.perf_counter() + seconds
+        open_cells = [cell for cell, tile in enumerate(self.tiles)
+                      if tile.value == sdk_tile.UNKNOWN]
+        # Cells with few candidates make short chains; try them first
+        open_cells.sort(key=lambda cell: sdk_tile.POPCOUNT[self.tiles[cell].mask])
+        for cell in open_cells:
+            if check is not None:
+                check()
+            if self.work >= budget:
+                log.debug("Chain search ran out of steps")
+                return None
+            if deadline is not None and time.perf_counter() >= deadline:
+                log.debug("Chain search ran out of time")
+                return None
+            found = (self._nice_loop(cell) or self._cell_forcing(cell))
+            if found is not None:
+                return found
+        return None
+
+    def _nice_loop(self, cell: int) -> Optional[Deduction]:
+        """A candidate of cell whose truth (or falsity) implies
+        its own opposite, or whose truth and falsity imply the
+        same thing
+        """
+        base = cell * NVALUES
+        for candidate in range(base, base + NVALUES):
+            if not self.alive[candidate]:
+                continue
+            if_on, clash = self.implications(candidate, True)
+            if clash is not None:
+                return Deduction("nice loop", [candidate], [],
+                                 [self.chain(if_on, (clash, True)),
+                                  self.chain(if_on, (clash, False))])
+            if_off, clash = self.implications(candidate, False)
+            if clash is not None:
+                return Deduction("nice loop", [], [candidate],
+                                 [self.chain(if_off, (clash, True)),
+                                  self.chain(if_off, (clash, False))])
+            found = self._common([if_on, if_off], "forcing chain")
+            if found is not None:
+                return found
+        return None
+
+    def _cell_forcing(self, cell: int) -> Optional[Deduction]:
+        """Something that follows from every candidate of cell"""
+        base = cell * NVALUES
+        branches = [self.implications(candidate, True)[0]
+                    for candidate in range(base, base + NVALUES)
+                    if self.alive[candidate]]
+        if len(branches) < 3:
+            # Two candidates: the same as both truth values of one
+            return None
+        return self._common(branches, "cell forcing chain")
+
+    def _common(self, branches: List[Dict[Step, Optional[Step]]],
+                kind: str) -> Optional[Deduction]:
+        """A deduction from the steps reached in every branch"""
+        common = set(branches[0])
+        for reached in branches[1:]:
+            common &= reached.keys()
+        eliminate = []
+        place = []
+        for candidate, on in common:
+            if not self.alive[candidate]:
+                continue
+            if on and self.tiles[candidate // NVALUES].value == sdk_tile.UNKNOWN:
+                place.append(candidate)
+            elif not on:
+                eliminate.append(candidate)
+        if not (eliminate or place):
+            return None
+        step = (place[0], True) if place else (eliminate[0], False)
+        return Deduction(kind, sorted(eliminate), sorted(place),
+                         [self.chain(reached, step) for reached in branches])
+
+
+def graph(board: Board) -> LinkGraph:
+    """The link graph of board, brought up to date.  It is kept
+    on the board, so it is reused while that board is solved and
+    goes when the board does.
+    """
+    if board.links is None:
+        board.links = LinkGraph(board)
+    else:
+        board.links.refresh()
+    return board.links
+
+
+def chains(board: Board, budget: int = BUDGET, seconds: float = None,
+           check: Callable[[], None] = None) -> bool:
+    """Make one deduction by chains, if one can be found within
+    budget steps (and seconds, if given; see LinkGraph.find).
+    Returns True iff some change has been made.
+    """
+    deduction = graph(board).find(budget, seconds, check)
+    if deduction is None:
+        return False
+    log.debug(str(deduction))
+    return deduction.apply(board)
@@ -28,6 +28,9 @@ NCOLS = 9
 
 class Board(object):
     """View of board.Board"""
+    # We narrate the attention scan too, and every change
+    scan = True
+    batched = False
 
     def __init__(self, model: sdk_board.Board):
         """Create a view of the board.
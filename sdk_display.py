@@ -83,6 +83,8 @@ class Tile(sdk_tile.TileListener):
         self.row = model.row
         self.col = model.col
         self.scan = scan
+        # Redraw once per solver step, unless showing the scan
+        self.batched = not scan
         self.grid.sub_grid_dim(3, 3)
         self._update(sdk_tile.TileChanged(self.model))
         self.model.add_listener(self)
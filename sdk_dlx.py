@@ -0,0 +1,187 @@
+"""
+A second solving engine: Sudoku as an exact cover problem,
+solved with Knuth's Algorithm X using Dancing Links.
+
+Each of the 729 possible placements (cell, digit) is a row
+of the cover matrix, covering four of its 324 columns: the
+cell is filled, and the digit appears in the row, column,
+and block.  A solution is a set of 81 rows covering every
+column exactly once.
+
+This engine is for bulk solving; it does not explain itself
+and does not notify listeners along the way.  It reads the
+givens from a Board and writes the solution back into it.
+"""
+
+from typing import List
+
+from sdk_board import Board
+import sdk_tile
+from sdk_topology import NCELLS, ROW_OF, COL_OF, BLOCK_OF
+
+import logging
+logging.basicConfig()
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+NCOLUMNS = 4 * NCELLS
+ROOT = 0
+
+# Cover matrix template, built once.  Nodes 1..324 are column
+# headers, node 0 is the root of the header list, and each
+# (cell, digit) row contributes four more nodes.  Each solve
+# works on a copy of the link arrays.
+
+
+def _build_links():
+    left = list(range(-1, NCOLUMNS))
+    right = list(range(1, NCOLUMNS + 2))
+    left[ROOT] = NCOLUMNS
+    right[NCOLUMNS] = ROOT
+    up = list(range(NCOLUMNS + 1))
+    down = list(range(NCOLUMNS + 1))
+    column = list(range(NCOLUMNS + 1))
+    size = [0] * (NCOLUMNS + 1)
+    placement = [-1] * (NCOLUMNS + 1)
+    first_node = []
+    for cell in range(NCELLS):
+        for digit in range(9):
+            columns = (1 + cell,
+                       1 + NCELLS + 9 * ROW_OF[cell] + digit,
+                       1 + 2 * NCELLS + 9 * COL_OF[cell] + digit,
+                       1 + 3 * NCELLS + 9 * BLOCK_OF[cell] + digit)
+            first = len(left)
+            first_node.append(first)
+            for k, col in enumerate(columns):
+                node = first + k
+                left.append(first + (k - 1) % 4)
+                right.append(first + (k + 1) % 4)
+                up.append(up[col])
+                down.append(col)
+                down[up[col]] = node
+                up[col] = node
+                column.append(col)
+                size[col] += 1
+                placement.append(9 * cell + digit)
+    return left, right, up, down, column, size, placement, first_node
+
+
+(_LEFT, _RIGHT, _UP, _DOWN, _COLUMN, _SIZE,
+ _PLACEMENT, _FIRST_NODE) = _build_links()
+
+
+def solve_line(puzzle: str, limit: int = 1) -> List[str]:
+    """Solutions of an 81 character puzzle (digits for givens,
+    anything else for blank cells), as 81 character strings.
+    Stops after limit solutions; at most one by default.
+    """
+    left = _LEFT[:]
+    right = _RIGHT[:]
+    up = _UP[:]
+    down = _DOWN[:]
+    column = _COLUMN
+    size = _SIZE[:]
+    placement = _PLACEMENT
+    covered = [False] * (NCOLUMNS + 1)
+
+    def cover(col: int):
+        right[left[col]] = right[col]
+        left[right[col]] = left[col]
+        covered[col] = True
+        i = down[col]
+        while i != col:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(col: int):
+        i = up[col]
+        while i != col:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[col]] = col
+        left[right[col]] = col
+        covered[col] = False
+
+    # The givens are part of every solution
+    chosen = []
+    for cell in range(NCELLS):
+        bit = sdk_tile.BIT.get(puzzle[cell], 0)
+        if not bit:
+            continue
+        first = _FIRST_NODE[9 * cell + bit.bit_length() - 1]
+        nodes = (first, first + 1, first + 2, first + 3)
+        if any(covered[column[node]] for node in nodes):
+            # Two givens clash
+            return []
+        for node in nodes:
+            cover(column[node])
+        chosen.append(placement[first])
+
+    solutions = []
+
+    def search() -> bool:
+        """Extend chosen; True when we have enough solutions"""
+        if right[ROOT] == ROOT:
+            grid = ["."] * NCELLS
+            for choice in chosen:
+                grid[choice // 9] = sdk_tile.CHOICES[choice % 9]
+            solutions.append("".join(grid))
+            return len(solutions) >= limit
+        # The column with fewest remaining rows
+        best = right[ROOT]
+        fewest = size[best]
+        col = right[best]
+        while col != ROOT and fewest > 1:
+            if size[col] < fewest:
+                best = col
+                fewest = size[col]
+            col = right[col]
+        if fewest == 0:
+            return False
+        cover(best)
+        done = False
+        row = down[best]
+        while row != best:
+            chosen.append(placement[row])
+            j = right[row]
+            while j != row:
+                cover(column[j])
+                j = right[j]
+            done = search()
+            j = left[row]
+            while j != row:
+                uncover(column[j])
+                j = left[j]
+            chosen.pop()
+            if done:
+                break
+            row = down[row]
+        uncover(best)
+        return done
+
+    search()
+    return solutions
+
+
+def solve(board: Board) -> bool:
+    """Solve board in place.  Returns True iff a solution was
+    found; otherwise the board is left as it was.
+    """
+    puzzle = "".join(board.as_list())
+    solutions = solve_line(puzzle)
+    if not solutions:
+        log.debug("No solution for\n{}".format(board))
+        return False
+    solution = solutions[0]
+    board.set_tiles([solution[base:base + 9] for base in range(0, NCELLS, 9)])
+    return True
@@ -0,0 +1,259 @@
+"""
+Making new puzzles.  We fill a complete grid at random,
+then take clues away one at a time (or a symmetric group of
+them at a time), keeping each removal only if the puzzle still
+has exactly one solution.
+
+The solver completes the grid, and uniqueness is checked by
+counting solutions to two with the Dancing Links engine, which
+answers these many small questions about three times faster
+than count_solutions on a Board.
+
+Clues are tried a few orbits at a time.  If a whole batch can
+go, so could each orbit in turn (a puzzle with fewer blanks has
+no more solutions), so we get the same puzzle as removing them
+one by one, with fewer checks while most removals succeed.
+
+Run as a program to write puzzles in the one-line format:
+    python3 sdk_generator.py -n 1000 --clues 26 --symmetry rotational
+"""
+
+import argparse
+import multiprocessing
+import random
+import sys
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from sdk_board import Board
+import sdk_batch
+import sdk_dlx
+import sdk_io
+import sdk_solver
+import sdk_tile
+from sdk_topology import NCELLS
+
+import logging
+logging.basicConfig()
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+
+# ---------------------------------
+# Symmetry of the clue pattern
+# ---------------------------------
+
+def _rotate_180(row: int, col: int) -> Tuple[int, int]:
+    return 8 - row, 8 - col
+
+
+def _rotate_90(row: int, col: int) -> Tuple[int, int]:
+    return col, 8 - row
+
+
+def _mirror(row: int, col: int) -> Tuple[int, int]:
+    return row, 8 - col
+
+
+def _diagonal(row: int, col: int) -> Tuple[int, int]:
+    return col, row
+
+
+# Each symmetry is given by the maps that generate it
+SYMMETRIES: Dict[str, List[Callable[[int, int], Tuple[int, int]]]] = {
+    "none": [],
+    "rotational": [_rotate_180],
+    "quarter": [_rotate_90],
+    "mirror": [_mirror],
+    "diagonal": [_diagonal],
+}
+
+
+def orbits(symmetry: str) -> List[Tuple[int, ...]]:
+    """Groups of cells that must be clues together (or blanks
+    together) for the clue pattern to have the symmetry
+    """
+    maps = SYMMETRIES[symmetry]
+    seen = set()
+    result = []
+    for cell in range(81):
+        if cell in seen:
+            continue
+        orbit = {cell}
+        frontier = [cell]
+        while frontier:
+            here = frontier.pop()
+            for transform in maps:
+                row, col = transform(here // 9, here % 9)
+                there = row * 9 + col
+                if there not in orbit:
+                    orbit.add(there)
+                    frontier.append(there)
+        seen |= orbit
+        result.append(tuple(sorted(orbit)))
+    return result
+
+
+# ---------------------------------
+# Complete grids
+# ---------------------------------
+
+def random_grid(rng: random.Random, board: Board = None) -> str:
+    """A random complete grid in the one-line format.  The three
+    blocks on the diagonal do not constrain each other, so we fill
+    them at random, let the solver complete the grid, then shuffle
+    rows, columns, bands, and stacks in ways that keep it valid.
+    """
+    if board is None:
+        board = Board()
+    rows = [[sdk_tile.UNKNOWN] * 9 for _ in range(9)]
+    for block in range(3):
+        digits = sdk_tile.CHOICES[:]
+        rng.shuffle(digits)
+        for k, digit in enumerate(digits):
+            rows[3 * block + k // 3][3 * block + k % 3] = digit
+    board.set_tiles(rows)
+    sdk_solver.solve(board)
+    grid = sdk_io.as_line(board)
+
+    def shuffled_lines() -> List[int]:
+        bands = [0, 1, 2]
+        rng.shuffle(bands)
+        order = []
+        for band in bands:
+            lines = [0, 1, 2]
+            rng.shuffle(lines)
+            order.extend(3 * band + line for line in lines)
+        return order
+
+    row_order = shuffled_lines()
+    col_order = shuffled_lines()
+    transpose = rng.random() < 0.5
+    cells = []
+    for row in range(9):
+        for col in range(9):
+            r, c = row_order[row], col_order[col]
+            cells.append(grid[c * 9 + r] if transpose else grid[r * 9 + c])
+    return "".join(cells)
+
+
+# ---------------------------------
+# Removing clues
+# ---------------------------------
+
+# Orbits tried at once while removals keep succeeding
+BATCH = 4
+
+
+def _remove(cells: List[str], grid: str,
+            batch: List[Tuple[int, ...]]) -> int:
+    """Blank the orbits of batch that can go, as removing them
+    one at a time in order would, and return how many cells
+    were blanked.  If they can't all go, we try each half.
+    """
+    for orbit in batch:
+        for cell in orbit:
+            cells[cell] = sdk_tile.UNKNOWN
+    if len(sdk_dlx.solve_line("".join(cells), limit=2)) == 1:
+        return sum(len(orbit) for orbit in batch)
+    for orbit in batch:
+        for cell in orbit:
+            cells[cell] = grid[cell]
+    if len(batch) == 1:
+        return 0
+    half = len(batch) // 2
+    return (_remove(cells, grid, batch[:half])
+            + _remove(cells, grid, batch[half:]))
+
+
+def make_puzzle(grid: str, rng: random.Random, clues: int = 0,
+                symmetry: str = "none") -> str:
+    """A puzzle with solution grid and a unique solution,
+    removing clues until no more than clues remain or no
+    more can be removed.  Clues are removed an orbit of the
+    symmetry at a time.
+    """
+    cells = list(grid)
+    remaining = NCELLS
+    candidates = orbits(symmetry)
+    rng.shuffle(candidates)
+    size = BATCH
+    position = 0
+    while position < len(candidates) and remaining > clues:
+        # Orbits that could all go without passing the target
+        batch = []
+        removing = 0
+        while (position < len(candidates) and len(batch) < size
+               and remaining - removing > clues):
+            batch.append(candidates[position])
+            removing += len(candidates[position])
+            position += 1
+        removed = _remove(cells, grid, batch)
+        if removed < removing:
+            # Removals have begun to fail; batches cost more than they save
+            size = max(1, size // 2)
+        remaining -= removed
+    return "".join(cells)
+
+
+def generate(rng: random.Random, clues: int = 0, symmetry: str = "none",
+             board: Board = None) -> str:
+    """A new puzzle in the one-line format"""
+    return make_puzzle(random_grid(rng, board), rng, clues, symmetry)
+
+
+# ---------------------------------
+# Many puzzles, in parallel
+# ---------------------------------
+
+def _init_worker():
+    # The batch engine's per-process setup: a board to reuse
+    # for every grid, and quiet solver logging
+    sdk_batch._init_engine(sdk_solver.solve, False)
+
+
+def _generate_one(task: Tuple[int, int, str]) -> str:
+    seed, clues, symmetry = task
+    return generate(random.Random(seed), clues, symmetry,
+                    sdk_batch._engine_board)
+
+
+def generate_many(count: int, clues: int = 0, symmetry: str = "none",
+                  seed: int = None, jobs: int = 1) -> Iterator[str]:
+    """count puzzles, lazily, using jobs processes.  Puzzle i
+    is made from seed + i, so a run with a given seed can be
+    repeated exactly, whatever the number of jobs.
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    tasks = ((seed + i, clues, symmetry) for i in range(count))
+    if jobs <= 1:
+        _init_worker()
+        for task in tasks:
+            yield _generate_one(task)
+        return
+    with multiprocessing.Pool(jobs, initializer=_init_worker) as pool:
+        yield from pool.imap(_generate_one, tasks, chunksize=16)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sudoku puzzle generator")
+    parser.add_argument("-n", "--count", help="Number of puzzles",
+                        type=int, default=1)
+    parser.add_argument("-c", "--clues", help="Target number of clues",
+                        type=int, default=0)
+    parser.add_argument("-s", "--symmetry", help="Symmetry of the clues",
+                        choices=sorted(SYMMETRIES), default="none")
+    parser.add_argument("--seed", help="Random seed", type=int)
+    parser.add_argument("-j", "--jobs", help="Worker processes",
+                        type=int, default=1)
+    parser.add_argument("-o", "--output", help="Output file",
+                        type=argparse.FileType('w'), default=sys.stdout)
+    args = parser.parse_args()
+    with sdk_io.LineWriter(args.output) as writer:
+        for puzzle in generate_many(args.count, args.clues, args.symmetry,
+                                    args.seed, args.jobs):
+            writer.write(puzzle)
+
+
+if __name__ == "__main__":
+    main()
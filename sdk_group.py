@@ -6,9 +6,11 @@ or 'box').
 Constraint propagation are localized here.
 """
 
-from typing import Sequence, List
+from itertools import combinations
+from typing import Sequence, List, Tuple
 
 import sdk_tile
+import sdk_topology
 
 import logging
 logging.basicConfig()
@@ -19,11 +21,31 @@ log.setLevel(logging.WARN)
 class Group(object):
     """A group of 9 Sudoku tiles"""
 
-    def __init__(self, title: str):
-        """Initially empty.  The title is just for debugging."""
+    def __init__(self, title: str, unit: int = None):
+        """Initially empty.  The title is just for debugging.
+        A group that is one of the 27 units of a board knows
+        its unit number (see sdk_topology).
+        """
         self.title = title
+        self.unit = unit
         self.tiles: List[sdk_tile.Tile] = []
 
+    @classmethod
+    def for_unit(cls, unit: int, tiles: Sequence[sdk_tile.Tile]) -> "Group":
+        """The group for a unit of the board, given the
+        board's tiles as a flat list in cell order
+        """
+        group = cls(sdk_topology.UNIT_TITLES[unit], unit)
+        group.tiles = [tiles[cell] for cell in sdk_topology.UNIT_CELLS[unit]]
+        return group
+
+    @property
+    def cells(self) -> Sequence[int]:
+        """Cell indexes of the tiles in this group"""
+        if self.unit is not None:
+            return sdk_topology.UNIT_CELLS[self.unit]
+        return [tile.index for tile in self.tiles]
+
     def add(self, tile: sdk_tile.Tile):
         """Add a tile to this group"""
         assert len(self.tiles) < 9
@@ -38,15 +60,18 @@ class Group(object):
 
     def attend(self):
         """Announce that we are working on these tiles.  A view component
-        may make this visible.
+        may make this visible.  Only tiles with a listener that
+        asked for scan events need to hear about it.
         """
         for tile in self.tiles:
-            tile.attend()
+            if tile.scanners:
+                tile.attend()
 
     def unattend(self):
         """Announce that we are done working on these tiles for now"""
         for tile in self.tiles:
-            tile.unattend()
+            if tile.scanners:
+                tile.unattend()
 
     def is_complete(self) -> bool:
         """A group is complete if all of its tiles hold a
@@ -66,11 +91,11 @@ class Group(object):
         return True otherwise
         """
 
-        can_place = set()
+        can_place = 0
         used = set()
         for tile in self.tiles:
             # At least one candidate?
-            if len(tile.candidates) == 0:
+            if tile.mask == 0:
                 # No place to go!
                 return False
             if tile.value in used:
@@ -79,10 +104,10 @@ class Group(object):
             elif tile.value != sdk_tile.UNKNOWN:
                 used.add(tile.value)
             # A place for every tile?
-            can_place = can_place.union(tile.candidates)
+            can_place |= tile.mask
 
         # every value has a place to go
-        return can_place == set(sdk_tile.CHOICES)
+        return can_place == sdk_tile.ALL_CANDIDATES
 
     def duplicates(self) -> Sequence[str]:
         """One line report per duplicate found"""
@@ -117,18 +142,18 @@ class Group(object):
 
         self.attend()
         changed = False
-        used = set()
+        used = 0
 
         # Find the value of all tiles that are decided
         for tile in self.tiles:
             if tile.value != sdk_tile.UNKNOWN:
-                used.add(tile.value)
+                used |= sdk_tile.BIT[tile.value]
 
         # Already used values can't be used twice,
         # remove them from the unknown tiles
         for tile in self.tiles:
             if tile.value == sdk_tile.UNKNOWN:
-                changed = tile.eliminate(used) or changed
+                changed = tile.eliminate_mask(used) or changed
 
         self.unattend()
         return changed
@@ -145,25 +170,187 @@ class Group(object):
         self.attend()
         changed = False
 
-        # Each value must go somewhere
+        # Each value must go somewhere.  A value that appears in
+        # exactly one tile is in 'once' but not in 'twice'.
+        once, twice = self._placements()
         for val in sdk_tile.CHOICES:
-            possible_tiles = []
-            # Find all the tiles that this val could assigned to
+            bit = sdk_tile.BIT[val]
+            if not (once & bit) or (twice & bit):
+                continue
+            # Find the one tile that this val could be assigned to
             for tile in self.tiles:
-                if val in tile.candidates:
-                    possible_tiles.append(tile)
-
-            only_one_possible = len(possible_tiles) == 1
-            tile_is_unknown = False
-            if only_one_possible:
-                tile_is_unknown = possible_tiles[0].value == sdk_tile.UNKNOWN
-
-            # If there is only one possible tile AND that tiles value is UNKNOWN
-            # Then that tile must have that value
-            if only_one_possible and tile_is_unknown:
-                all_but_val = set(sdk_tile.CHOICES) - {val}
-                possible_tiles[0].eliminate(all_but_val)
+                if tile.mask & bit:
+                    break
+
+            # If that tile's value is UNKNOWN, it must have that value
+            if tile.value == sdk_tile.UNKNOWN:
+                tile.eliminate_mask(sdk_tile.ALL_CANDIDATES & ~bit)
                 changed = True
+                # Other candidates of that tile are gone now
+                once, twice = self._placements()
+
+        self.unattend()
+        return changed
 
+    def naked_subset_constrain(self, size: int) -> bool:
+        """
+        If some size tiles between them have only size
+        candidates, those values must go in those tiles, so no
+        other tile of the group can have them (a naked pair,
+        triple, or quad for size 2, 3, 4).
+        Return True if a change has been made, False otherwise.
+        """
+        popcount = sdk_tile.POPCOUNT
+        open_tiles = [tile for tile in self.tiles
+                      if tile.value == sdk_tile.UNKNOWN]
+        # Tiles with too many candidates can't be in a subset
+        small = [tile for tile in open_tiles
+                 if popcount[tile.mask] <= size]
+        if len(small) < size or len(open_tiles) <= size:
+            return False
+        self.attend()
+        changed = False
+        for subset in combinations(small, size):
+            union = 0
+            for tile in subset:
+                union |= tile.mask
+            if popcount[union] != size:
+                continue
+            for tile in open_tiles:
+                if tile not in subset:
+                    changed = tile.eliminate_mask(union) or changed
         self.unattend()
         return changed
+
+    def hidden_subset_constrain(self, size: int) -> bool:
+        """
+        If some size values can only go in the same size tiles
+        between them, those tiles can't hold anything else (a
+        hidden pair, triple, or quad for size 2, 3, 4).
+        Return True if a change has been made, False otherwise.
+        """
+        popcount = sdk_tile.POPCOUNT
+        mask_bits = sdk_tile.MASK_BITS
+        # Where each value not yet placed could go, as a
+        # mask over the positions of tiles in the group
+        placed = 0
+        places = {}
+        open_count = 0
+        for position, tile in enumerate(self.tiles):
+            if tile.value != sdk_tile.UNKNOWN:
+                placed |= tile.mask
+                continue
+            open_count += 1
+            for bit in mask_bits[tile.mask]:
+                places[bit] = places.get(bit, 0) | (1 << position)
+        if open_count <= size:
+            return False
+        where = [(bit, positions) for bit, positions in places.items()
+                 if not bit & placed and 2 <= popcount[positions] <= size]
+        if len(where) < size:
+            return False
+        self.attend()
+        changed = False
+        for subset in combinations(where, size):
+            values = 0
+            positions = 0
+            for bit, tile_positions in subset:
+                values |= bit
+                positions |= tile_positions
+            if popcount[positions] != size:
+                continue
+            for position, tile in enumerate(self.tiles):
+                if positions & (1 << position):
+                    changed = tile.eliminate_mask(tile.mask & ~values) or changed
+        self.unattend()
+        return changed
+
+    def _placements(self) -> Tuple[int, int]:
+        """Masks of the values that can be placed in at least one
+        and in at least two tiles of the group
+        """
+        once = 0
+        twice = 0
+        for tile in self.tiles:
+            twice |= once & tile.mask
+            once |= tile.mask
+        return once, twice
+
+
+class Intersection(object):
+    """Where a block meets a row or column: three tiles in
+    both, six only in the block, and six only in the line.
+    Each value the block needs must go in the block-only tiles
+    or the common tiles, and likewise for the line, which gives
+    the pointing pair and box-line reduction tactics.
+    """
+
+    def __init__(self, block: Group, line: Group,
+                 common: Sequence[sdk_tile.Tile],
+                 block_only: Sequence[sdk_tile.Tile],
+                 line_only: Sequence[sdk_tile.Tile]):
+        self.block = block
+        self.line = line
+        self.common = common
+        self.block_only = block_only
+        self.line_only = line_only
+
+    @classmethod
+    def for_intersection(cls, k: int, groups: Sequence[Group],
+                         tiles: Sequence[sdk_tile.Tile]) -> "Intersection":
+        """Intersection k of sdk_topology.INTERSECTIONS, given the
+        board's groups and its tiles as a flat list in cell order
+        """
+        block, line, common, block_only, line_only = \
+            sdk_topology.INTERSECTIONS[k]
+        return cls(groups[block], groups[line],
+                   [tiles[cell] for cell in common],
+                   [tiles[cell] for cell in block_only],
+                   [tiles[cell] for cell in line_only])
+
+    def __str__(self):
+        return "{} x {}".format(self.block.title, self.line.title)
+
+    def pointing_constrain(self) -> bool:
+        """
+        Pointing pair (or triple): a value that can go in the
+        common tiles but nowhere else in the block must go in the
+        common tiles, so it is removed from the rest of the line.
+        Return True if a change has been made, False otherwise.
+        """
+        common, block_rest, line_rest = self._unions()
+        return self._eliminate(self.line_only,
+                               common & ~block_rest & line_rest)
+
+    def box_line_constrain(self) -> bool:
+        """
+        Box-line reduction: a value that can go in the common
+        tiles but nowhere else in the line is removed from the
+        rest of the block.
+        Return True if a change has been made, False otherwise.
+        """
+        common, block_rest, line_rest = self._unions()
+        return self._eliminate(self.block_only,
+                               common & ~line_rest & block_rest)
+
+    def _unions(self) -> Tuple[int, int, int]:
+        """Candidates of the common, block-only, and line-only tiles"""
+        common = 0
+        for tile in self.common:
+            common |= tile.mask
+        block_rest = 0
+        for tile in self.block_only:
+            block_rest |= tile.mask
+        line_rest = 0
+        for tile in self.line_only:
+            line_rest |= tile.mask
+        return common, block_rest, line_rest
+
+    @staticmethod
+    def _eliminate(tiles: Sequence[sdk_tile.Tile], mask: int) -> bool:
+        changed = False
+        if mask:
+            for tile in tiles:
+                if tile.value == sdk_tile.UNKNOWN:
+                    changed = tile.eliminate_mask(mask) or changed
+        return changed
@@ -3,13 +3,19 @@ Reading and writing Sudoku boards.  We use the minimal
 subset of the SadMan Sudoku ".sdk" format,
 see http://www.sadmansoftware.com/sudoku/faq19.php
 
+We also read and write the one-line format used by most
+published puzzle collections: 81 characters per puzzle,
+row by row, with '.', '0' or '_' for blank tiles.
+
 Author: M Young, January 2018
 """
 
 import sdk_board
+import sdk_tile
 import typing
-from typing import List, Union
+from typing import List, Union, Iterator, Iterable, Tuple
 import sys
+import mmap
 from io import IOBase
 
 
@@ -17,6 +23,12 @@ class InputError(Exception):
     pass
 
 
+# Symbols for a blank tile in the one-line format
+BLANKS = ".0_"
+LINE_LENGTH = 81
+_LINE_TABLE = str.maketrans(BLANKS, sdk_tile.UNKNOWN * len(BLANKS))
+
+
 def read(f: Union[IOBase, str],
          board: sdk_board.Board=None) -> sdk_board.Board:
     """Read a Sudoku board from a file.  Pass in a path
@@ -42,5 +54,280 @@ def read(f: Union[IOBase, str],
     return board
 
 
+def read_all(f: Union[IOBase, str]) -> Iterator[List[str]]:
+    """Read any number of boards from a file, one at a time.
+    A board is either 9 rows of 9, or a single line of 81 in
+    the one-line format; blank lines between boards and SadMan
+    attribute lines (starting with '#') are skipped.
+    Yields the rows of each board, ready for Board.set_tiles.
+    """
+    if isinstance(f, str):
+        f = open(f, "r")
+    with f:
+        values = []
+        for row in f:
+            row = row.strip()
+            if row == "" or row.startswith("#"):
+                if values:
+                    raise InputError("Incomplete board {}".format(values))
+                continue
+            if len(row) == LINE_LENGTH and not values:
+                yield line_rows(parse_line(row))
+                continue
+            if len(row) != 9:
+                raise InputError("Puzzle row wrong length: {}"
+                                 .format(row))
+            values.append(row)
+            if len(values) == 9:
+                yield values
+                values = []
+        if values:
+            raise InputError("Incomplete board {}".format(values))
+
+
+# ----------------------------
+# One puzzle per line
+# ----------------------------
+
+def parse_line(line: str) -> str:
+    """A puzzle in the one-line format, checked and with
+    blanks normalized to UNKNOWN
+    """
+    line = line.strip()
+    if len(line) != LINE_LENGTH:
+        raise InputError("Puzzle line wrong length: {}".format(line))
+    puzzle = line.translate(_LINE_TABLE)
+    for symbol in puzzle:
+        if symbol != sdk_tile.UNKNOWN and symbol not in sdk_tile.BIT:
+            raise InputError("Bad symbol {} in puzzle line: {}"
+                             .format(symbol, line))
+    return puzzle
+
+
+def line_rows(line: str) -> List[str]:
+    """A one-line puzzle as 9 rows, for Board.set_tiles"""
+    return [line[base:base + 9] for base in range(0, LINE_LENGTH, 9)]
+
+
+def as_line(board: sdk_board.Board) -> str:
+    """The board in the one-line format"""
+    return "".join(board.as_list())
+
+
+def read_lines(f: Union[IOBase, str]) -> Iterator[str]:
+    """Puzzles from a file in the one-line format, lazily,
+    as normalized 81 character strings.  Blank lines and
+    lines starting with '#' are skipped.
+    """
+    if isinstance(f, str):
+        f = open(f, "r")
+    with f:
+        for line in f:
+            if line.isspace() or line.startswith("#"):
+                continue
+            yield parse_line(line)
+
+
+def read_boards(f: Union[IOBase, str],
+                board: sdk_board.Board=None) -> Iterator[sdk_board.Board]:
+    """Boards from a file in the one-line format, lazily.  If a
+    board is passed in, it is refilled for each puzzle rather
+    than making a new board each time.
+    """
+    for line in read_lines(f):
+        target = board if board is not None else sdk_board.Board()
+        target.set_tiles(line_rows(line))
+        yield target
+
+
+class LineWriter(object):
+    """Writes puzzles in the one-line format, a buffer at a time.
+    Use as a context manager, or call flush when done:
+
+        with LineWriter(f) as writer:
+            for board in boards:
+                writer.write(board)
+    """
+
+    def __init__(self, f: IOBase=sys.stdout, buffer_lines: int=4096):
+        self.f = f
+        self.buffer_lines = buffer_lines
+        self.lines: List[str] = []
+
+    def write(self, puzzle: Union[sdk_board.Board, str]):
+        """Add a board, or a puzzle already in the one-line format"""
+        if not isinstance(puzzle, str):
+            puzzle = as_line(puzzle)
+        self.lines.append(puzzle)
+        if len(self.lines) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            self.lines.append("")
+            self.f.write("\n".join(self.lines))
+            self.lines = []
+        self.f.flush()
+
+    def __enter__(self) -> "LineWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+
 def write(board: sdk_board.Board, f: IOBase=sys.stdout):
     """Print the board"""
+    for row in board.as_list():
+        f.write(row)
+        f.write("\n")
+
+
+# ----------------------------
+# Packed binary boards
+# ----------------------------
+
+def packed_size(candidates: bool=False) -> int:
+    """Bytes per board in a packed buffer"""
+    if candidates:
+        return sdk_board.CANDIDATES_SIZE
+    return sdk_board.VALUES_SIZE
+
+
+def pack_boards(boards: Iterable[sdk_board.Board],
+                candidates: bool=False) -> bytes:
+    """Many boards as one buffer of fixed-size records: tile
+    values only, or with candidates the full candidate state
+    (see Board.dump_values and Board.dump_candidates)
+    """
+    if candidates:
+        return b"".join(board.dump_candidates() for board in boards)
+    return b"".join(board.dump_values() for board in boards)
+
+
+def unpack_boards(data: Union[bytes, bytearray, memoryview],
+                  candidates: bool=False,
+                  board: sdk_board.Board=None) -> Iterator[sdk_board.Board]:
+    """Boards from a buffer made by pack_boards, lazily.  If a
+    board is passed in, it is refilled for each record.
+    """
+    size = packed_size(candidates)
+    if len(data) % size != 0:
+        raise InputError("Packed buffer is not a whole number of boards")
+    view = memoryview(data)
+    for start in range(0, len(view), size):
+        target = board if board is not None else sdk_board.Board()
+        record = view[start:start + size]
+        if candidates:
+            target.load_candidates(record)
+        else:
+            target.load_values(record)
+        yield target
+
+
+# ----------------------------
+# Memory-mapped corpus
+# ----------------------------
+
+class Corpus(object):
+    """A file of puzzles in the one-line format in which every
+    line has the same width (81 characters and the line ending),
+    accessed through a memory map.  Puzzle i is found by
+    arithmetic rather than by reading the lines before it, and
+    nothing is copied out of the map until a puzzle is asked for.
+
+    corpus[i] is puzzle i as a normalized string; corpus[a:b] is
+    a Corpus sharing the same map, holding puzzles a..b-1.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        first = self._file.readline()
+        if len(first.rstrip(b"\r\n")) != LINE_LENGTH:
+            self._file.close()
+            raise InputError("Not a fixed-width puzzle file: {}"
+                             .format(path))
+        self.width = len(first)
+        self.map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        # The last line may lack its line ending
+        count, extra = divmod(len(self.map), self.width)
+        if extra == LINE_LENGTH:
+            count += 1
+        elif extra != 0:
+            self.close()
+            raise InputError("Lines of different widths in {}"
+                             .format(path))
+        self.first = 0
+        self.stop = count
+
+    def _view(self, first: int, stop: int) -> "Corpus":
+        view = Corpus.__new__(Corpus)
+        view.path = self.path
+        view._file = self._file
+        view.width = self.width
+        view.map = self.map
+        view.first = first
+        view.stop = stop
+        return view
+
+    def __len__(self) -> int:
+        return self.stop - self.first
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[str, "Corpus"]:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("Corpus slices must be contiguous")
+            return self._view(self.first + start,
+                              self.first + max(start, stop))
+        return parse_line(self.raw(key).decode("ascii"))
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def raw(self, i: int) -> bytes:
+        """The bytes of puzzle i, unchecked"""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Puzzle {} not in corpus".format(i))
+        start = (self.first + i) * self.width
+        return self.map[start:start + LINE_LENGTH]
+
+    def board(self, i: int,
+              board: sdk_board.Board=None) -> sdk_board.Board:
+        """Puzzle i on a board (refilling board if given)"""
+        if board is None:
+            board = sdk_board.Board()
+        board.set_tiles(line_rows(self[i]))
+        return board
+
+    def offsets(self) -> Tuple[int, int]:
+        """Byte range of the puzzles in this corpus (or slice)"""
+        return self.first * self.width, self.stop * self.width
+
+    def close(self):
+        """Release the map; slices taken from this corpus go too"""
+        self.map.close()
+        self._file.close()
+
+    def __enter__(self) -> "Corpus":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def is_corpus(path: str) -> bool:
+    """Does the file look like a fixed-width one-line puzzle file?
+    (judged by its first line and its size)
+    """
+    with open(path, "rb") as f:
+        first = f.readline()
+        if len(first.rstrip(b"\r\n")) != LINE_LENGTH:
+            return False
+        f.seek(0, 2)
+        size = f.tell()
+    return size % len(first) in (0, LINE_LENGTH)
@@ -0,0 +1,127 @@
+"""
+A vectorized engine for solving many puzzles at once.
+
+N puzzles are held as an (N, 81, 9) boolean tensor of
+candidates, and the naked single and hidden single tactics
+(as in sdk_group.Group.naked_single_constrain and
+hidden_single_constrain) are applied to every group of every
+board in one array operation, using the unit tables of
+sdk_topology as index arrays.  Easy and medium puzzles are
+usually solved by propagation alone; boards that stall are
+finished one at a time by the back-track solver in sdk_solver.
+
+Requires NumPy, which the rest of the program does not need.
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from sdk_board import Board
+import sdk_solver
+import sdk_tile
+import sdk_topology
+import sdk_io
+
+import logging
+logging.basicConfig()
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+# unit -> its 9 cells, and cell -> its 3 units
+UNITS = np.array(sdk_topology.UNIT_CELLS, dtype=np.intp)
+CELL_UNITS = np.array(sdk_topology.CELL_UNITS, dtype=np.intp)
+
+# Character code -> position in CHOICES plus one, 0 for anything else
+_CODE = np.zeros(256, dtype=np.int8)
+for _position, _choice in enumerate(sdk_tile.CHOICES):
+    _CODE[ord(_choice)] = _position + 1
+_SYMBOLS = np.array([ord(sdk_tile.UNKNOWN)]
+                    + [ord(choice) for choice in sdk_tile.CHOICES],
+                    dtype=np.uint8)
+
+
+def candidates(lines: Sequence[str]) -> np.ndarray:
+    """Candidate tensor for puzzles in the one-line format"""
+    text = "".join(lines).encode("ascii")
+    codes = _CODE[np.frombuffer(text, dtype=np.uint8)].reshape(-1, 81)
+    cands = np.ones(codes.shape + (9,), dtype=bool)
+    known = codes > 0
+    cands[known] = np.arange(1, 10) == codes[known][:, None]
+    return cands
+
+
+def lines(cands: np.ndarray) -> List[str]:
+    """Boards in the one-line format, UNKNOWN where a tile
+    has more or less than one candidate
+    """
+    single = cands.sum(axis=2) == 1
+    codes = np.where(single, cands.argmax(axis=2) + 1, 0)
+    text = _SYMBOLS[codes].tobytes().decode("ascii")
+    return [text[base:base + 81] for base in range(0, len(text), 81)]
+
+
+def _step(cands: np.ndarray) -> np.ndarray:
+    """One round of naked single and hidden single on every board"""
+    known = cands.sum(axis=2) == 1
+    placed = cands & known[:, :, np.newaxis]
+    # Naked single: a value held by a known tile is removed from
+    # every other tile of its groups.  Count the known tiles
+    # holding each value in each unit, then for each tile add up
+    # its three units, leaving out the tile itself.
+    in_unit = placed[:, UNITS, :].sum(axis=2, dtype=np.int8)
+    seen = in_unit[:, CELL_UNITS, :].sum(axis=2, dtype=np.int8)
+    cands = cands & (seen - 3 * placed <= 0)
+    # Hidden single: a value that fits only one tile of a
+    # group must go there
+    places = cands[:, UNITS, :].sum(axis=2, dtype=np.int8)
+    only = (places == 1)[:, CELL_UNITS, :].any(axis=2) & cands
+    return np.where(only.any(axis=2)[:, :, np.newaxis], only, cands)
+
+
+def propagate(cands: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Apply the single tactics to all boards until none of them
+    changes.  Updates cands in place and returns (solved, failed)
+    boolean arrays over the boards.
+    """
+    active = np.arange(len(cands))
+    while len(active):
+        before = cands[active]
+        after = _step(before)
+        changed = (after != before).any(axis=(1, 2))
+        cands[active] = after
+        active = active[changed]
+    counts = cands.sum(axis=2)
+    known = counts == 1
+    placed = cands & known[:, :, np.newaxis]
+    duplicated = (placed[:, UNITS, :].sum(axis=2) > 1).any(axis=(1, 2))
+    homeless = (cands[:, UNITS, :].sum(axis=2) == 0).any(axis=(1, 2))
+    failed = (counts == 0).any(axis=1) | duplicated | homeless
+    solved = known.all(axis=1) & ~failed
+    return solved, failed
+
+
+def solve_lines(puzzles: Sequence[str]) -> List[Tuple[str, bool]]:
+    """Solve puzzles given in the one-line format.  Returns
+    (board in the one-line format, solved) for each.
+    """
+    if not puzzles:
+        return []
+    cands = candidates(puzzles)
+    solved, failed = propagate(cands)
+    results = [(line, bool(done)) for line, done in zip(lines(cands), solved)]
+    stalled = np.flatnonzero(~solved & ~failed)
+    log.debug("{} of {} boards need search".format(len(stalled), len(puzzles)))
+    board = Board()
+    for index in stalled:
+        board.set_tiles(sdk_io.line_rows(results[index][0]))
+        done = sdk_solver.solve(board) and board.is_solved()
+        results[index] = (sdk_io.as_line(board), done)
+    return results
+
+
+def solve(board: Board) -> bool:
+    """Solve a single board in place (for use as an ordinary engine)"""
+    solution, solved = solve_lines([sdk_io.as_line(board)])[0]
+    board.set_tiles(sdk_io.line_rows(solution))
+    return solved
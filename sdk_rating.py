@@ -0,0 +1,218 @@
+"""
+Grading puzzles by the tactics needed to solve them.
+
+We solve with the ladder of tactics in sdk_solver.TACTICS,
+always using the easiest tactic that makes progress and going
+back to the bottom of the ladder after each step, so a harder
+tactic is counted only when nothing easier would do.  If the
+ladder stalls we guess, as sdk_solver.solve does, and climb
+the ladder again after each guess, leaving out the forcing
+chains: below a guess only the depth counts, and the chain
+search would cost far more than the guesses it saves.
+
+The grade is the weight of the hardest tactic used, or, if
+guessing was needed, GUESS_WEIGHT plus the depth of the deepest
+guess.  Unlike solve time it does not depend on the machine or
+its load.  It only means something for a puzzle with exactly one
+solution, so each rating also has a status saying whether it has.
+
+Run as a program to grade every puzzle in some files:
+    python3 sdk_rating.py -j 4 data
+"""
+
+import argparse
+import multiprocessing
+import sys
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from events import Batch
+from sdk_board import Board
+import sdk_batch
+import sdk_chains
+import sdk_dlx
+import sdk_io
+import sdk_solver
+import sdk_tile
+
+import logging
+logging.basicConfig()
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+# Any puzzle that needs a guess is harder than any that doesn't
+GUESS_WEIGHT = 10.0
+
+# Rungs climbed after a guess
+GUESS_LADDER = [(name, weight, tactic)
+                for name, weight, tactic in sdk_solver.TACTICS
+                if tactic is not sdk_chains.chains]
+
+# Statuses of a rating
+UNIQUE = "unique"
+NO_SOLUTION = "no solution"
+NOT_UNIQUE = "not unique"
+
+# (highest grade, name) of each difficulty tier: singles,
+# intersections and naked pairs, fish and the larger subsets,
+# forcing chains, then guessing
+TIERS = [(1.0, "easy"),
+         (1.5, "medium"),
+         (3.0, "hard"),
+         (5.4, "tough"),
+         (GUESS_WEIGHT, "expert"),
+         (GUESS_WEIGHT + 1, "fiendish"),
+         (float("inf"), "diabolical")]
+
+
+class Rating(object):
+    """How a puzzle was solved: how often each tactic
+    fired, and how many guesses, how deeply nested, it took
+    """
+
+    def __init__(self):
+        self.fired: Dict[str, int] = {}
+        self.hardest = 0.0
+        self.guesses = 0
+        self.depth = 0
+        self.solved = False
+        self.status = UNIQUE
+
+    def record(self, name: str, weight: float):
+        self.fired[name] = self.fired.get(name, 0) + 1
+        self.hardest = max(self.hardest, weight)
+
+    @property
+    def grade(self) -> float:
+        if self.guesses:
+            return GUESS_WEIGHT + self.depth
+        return self.hardest
+
+    @property
+    def tier(self) -> str:
+        for limit, name in TIERS:
+            if self.grade <= limit:
+                return name
+
+    def __str__(self) -> str:
+        fired = ", ".join("{} {}".format(name, count)
+                          for name, count in self.fired.items())
+        text = "grade {:.1f} ({}): {}; {} guesses, depth {}".format(
+            self.grade, self.tier, fired or "no tactics",
+            self.guesses, self.depth)
+        if self.status == UNIQUE:
+            return text
+        return "{}: {}".format(self.status, text)
+
+
+def rate(board: Board) -> Rating:
+    """Solve board in place, rating how hard it was.  Tactics
+    only make sound deductions, so a puzzle solved without
+    guessing has no other solution; one that needed guesses is
+    checked for a second.
+    """
+    puzzle = "".join(board.as_list())
+    rating = Rating()
+    rating.solved = _climb(board, rating) and _search(board, rating, 1)
+    if not rating.solved:
+        rating.status = NO_SOLUTION
+    elif rating.guesses and len(sdk_dlx.solve_line(puzzle, limit=2)) > 1:
+        rating.status = NOT_UNIQUE
+    return rating
+
+
+def rate_line(puzzle: str) -> Rating:
+    """Rating of a puzzle in the one-line format"""
+    board = Board()
+    board.set_tiles(sdk_io.line_rows(puzzle))
+    return rate(board)
+
+
+def _climb(board: Board, rating: Rating,
+           ladder: List[sdk_solver.Tactic] = sdk_solver.TACTICS) -> bool:
+    """Apply the easiest tactic of ladder that makes progress
+    until none does.  Returns False if the board turned out
+    inconsistent.
+    """
+    while True:
+        with Batch():
+            for name, weight, tactic in ladder:
+                if tactic(board):
+                    rating.record(name, weight)
+                    break
+            else:
+                return board.is_consistent()
+
+
+def _search(board: Board, rating: Rating, depth: int) -> bool:
+    """Guess, as in sdk_solver.solve, climbing after each guess"""
+    tile = sdk_solver.choose_tile(board)
+    if tile is None:
+        return True
+    rating.guesses += 1
+    rating.depth = max(rating.depth, depth)
+    checkpoint = board.checkpoint()
+    for guess in sdk_tile.MASK_CHOICES[tile.mask]:
+        tile.set_value(guess)
+        if (_climb(board, rating, GUESS_LADDER)
+                and _search(board, rating, depth + 1)):
+            return True
+        with Batch():
+            board.undo(checkpoint)
+    return False
+
+
+# ---------------------------------
+# Grading collections, in parallel
+# ---------------------------------
+
+def _init_worker():
+    # The batch engine's per-process setup: a board to reuse
+    # for every puzzle, and quiet solver logging
+    sdk_batch._init_engine(rate, False)
+
+
+def _grade(puzzle: str) -> Tuple[str, float, str]:
+    board = sdk_batch._engine_board
+    board.set_tiles(sdk_io.line_rows(puzzle))
+    rating = rate(board)
+    return puzzle, rating.grade, rating.status
+
+
+def _puzzles(paths: Iterable[str]) -> Iterator[str]:
+    for path in sdk_batch.puzzle_files(paths):
+        for rows in sdk_io.read_all(path):
+            yield "".join(rows)
+
+
+def grade_all(paths: Iterable[str], jobs: int = 1,
+              chunk_size: int = 64) -> Iterator[Tuple[str, float, str]]:
+    """(puzzle, grade, status) for every puzzle in paths, in
+    order.  The grade means little unless the status is UNIQUE.
+    """
+    if jobs <= 1:
+        _init_worker()
+        yield from map(_grade, _puzzles(paths))
+        return
+    with multiprocessing.Pool(jobs, initializer=_init_worker) as pool:
+        yield from pool.imap(_grade, _puzzles(paths), chunksize=chunk_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sudoku difficulty grader")
+    parser.add_argument("-j", "--jobs", help="Worker processes",
+                        type=int, default=1)
+    parser.add_argument("-o", "--output", help="Output file",
+                        type=argparse.FileType('w'), default=sys.stdout)
+    parser.add_argument("files", nargs="+", metavar="file")
+    args = parser.parse_args()
+    with sdk_io.LineWriter(args.output) as writer:
+        for puzzle, grade, status in grade_all(args.files, args.jobs):
+            if status == UNIQUE:
+                writer.write("{:.1f} {}".format(grade, puzzle))
+            else:
+                # Commented out, so graded output can be read back
+                writer.write("# {} {}".format(status, puzzle))
+
+
+if __name__ == "__main__":
+    main()
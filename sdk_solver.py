@@ -6,8 +6,19 @@ two) the search-based solver.
 Author: FIXME
 """
 
+import copy
+import random
+import time
+from collections import deque
+from functools import partial
+from itertools import combinations
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from events import Batch
 from sdk_board import Board
+import sdk_chains
 import sdk_tile
+import sdk_topology
 
 import logging
 logging.basicConfig()
@@ -37,65 +48,879 @@ def hidden_single(board: Board) -> bool:
     return changed
 
 
-def propagate(board: Board):
+def naked_subsets(board: Board, size: int) -> bool:
+    """Naked pairs, triples, or quads (for size 2, 3, 4) in
+    every group.  Returns True iff some change has been made
+    """
+    changed = False
+    for group in board.groups:
+        changed = group.naked_subset_constrain(size) or changed
+    return changed
+
+
+def hidden_subsets(board: Board, size: int) -> bool:
+    """Hidden pairs, triples, or quads (for size 2, 3, 4) in
+    every group.  Returns True iff some change has been made
+    """
+    changed = False
+    for group in board.groups:
+        changed = group.hidden_subset_constrain(size) or changed
+    return changed
+
+
+def pointing(board: Board) -> bool:
+    """Pointing pairs and triples wherever a block meets a line.
+    Returns True iff some change has been made
+    """
+    changed = False
+    for intersection in board.intersections:
+        changed = intersection.pointing_constrain() or changed
+    return changed
+
+
+def box_line(board: Board) -> bool:
+    """Box-line reduction wherever a block meets a line.
+    Returns True iff some change has been made
+    """
+    changed = False
+    for intersection in board.intersections:
+        changed = intersection.box_line_constrain() or changed
+    return changed
+
+
+def basic_fish(board: Board, size: int) -> bool:
+    """X-Wing, Swordfish, or Jellyfish (for size 2, 3, 4).  If in
+    size rows a value can only go in the same size columns, each
+    of those columns has it in one of those rows, so it can go
+    nowhere else in those columns; likewise with rows and columns
+    swapped.  Uses the board's per-value occurrence index rather
+    than scanning the tiles.
+    Returns True iff some change has been made
+    """
+    occurrences = board.occurrences
+    occurrences.catch_up(board)
+    tiles = board.tiles
+    popcount = sdk_tile.POPCOUNT
+    changed = False
+    for v, choice in enumerate(sdk_tile.CHOICES):
+        bit = sdk_tile.BIT[choice]
+        for by_row in (True, False):
+            if by_row:
+                base, cover = occurrences.rows[v], occurrences.cols[v]
+            else:
+                base, cover = occurrences.cols[v], occurrences.rows[v]
+            lines = [line for line in range(9)
+                     if 2 <= popcount[base[line]] <= size]
+            found = False
+            for fish in combinations(lines, size):
+                union = 0
+                bases = 0
+                for line in fish:
+                    union |= base[line]
+                    bases |= 1 << line
+                if popcount[union] != size:
+                    continue
+                for cross in range(9):
+                    if not union & (1 << cross):
+                        continue
+                    others = cover[cross] & ~bases
+                    for line in range(9):
+                        if others & (1 << line):
+                            tile = (tiles[line][cross] if by_row
+                                    else tiles[cross][line])
+                            found = tile.eliminate_mask(bit) or found
+                if found:
+                    break
+            if found:
+                # The index for this value is out of date now
+                changed = True
+                break
+    return changed
+
+
+# The ladder of tactics, easiest first, each with a weight that
+# says how hard it is for a human solver.  A tactic applies
+# itself to the whole board and returns True iff it changed
+# something.  Used by sdk_rating to grade puzzles.
+Tactic = Tuple[str, float, Callable[[Board], bool]]
+TACTICS: List[Tactic] = [
+    ("naked single", 1.0, naked_single),
+    ("hidden single", 1.5, hidden_single),
+    ("pointing", 2.6, pointing),
+    ("box-line", 2.8, box_line),
+    ("naked pair", 3.0, partial(naked_subsets, size=2)),
+    ("x-wing", 3.2, partial(basic_fish, size=2)),
+    ("hidden pair", 3.4, partial(hidden_subsets, size=2)),
+    ("naked triple", 3.6, partial(naked_subsets, size=3)),
+    ("swordfish", 3.8, partial(basic_fish, size=3)),
+    ("hidden triple", 4.0, partial(hidden_subsets, size=3)),
+    ("naked quad", 5.0, partial(naked_subsets, size=4)),
+    ("jellyfish", 5.2, partial(basic_fish, size=4)),
+    ("hidden quad", 5.4, partial(hidden_subsets, size=4)),
+    ("forcing chain", 7.0, sdk_chains.chains),
+]
+
+
+class SearchStats(object):
+    """Work done by solve: nodes is the number of guesses
+    tried, backtracks the number that had to be undone, and
+    probes the number of values tried out by propagation alone
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.backtracks = 0
+        self.probes = 0
+
+    def __str__(self) -> str:
+        return "{} nodes, {} backtracks, {} probes".format(
+            self.nodes, self.backtracks, self.probes)
+
+
+class Cancel(object):
+    """A cooperative cancellation token.  Another thread (or a
+    signal handler) calls cancel, and a solve given the token
+    gives up at its next budget check.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class BudgetExceeded(Exception):
+    """Raised by Budget.check when the solver should give up"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Budget(object):
+    """Limits on a solve: timeout seconds from now and a Cancel
+    token, either of which may be None.  check is called at
+    every propagation step and every guess, so it is kept cheap:
+    the clock is read only once every CLOCK_EVERY calls.
+
+    The time limit applies only once progressed is set, which
+    Search.run clears at the start and sets after each piece of
+    work it keeps, so that each run gets something done even if
+    the time is short.
+    """
+    CLOCK_EVERY = 16
+
+    def __init__(self, timeout: float = None, cancel: Cancel = None):
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.cancel = cancel
+        self.progressed = True
+        self._calls = 0
+
+    def check(self):
+        """Raise BudgetExceeded if the solver should give up"""
+        if self.cancel is not None and self.cancel.cancelled:
+            raise BudgetExceeded("cancelled")
+        if self.deadline is not None and self.progressed:
+            self._calls += 1
+            if self._calls >= self.CLOCK_EVERY:
+                self._calls = 0
+                if time.monotonic() >= self.deadline:
+                    raise BudgetExceeded("time limit")
+
+
+class Result(object):
+    """The outcome of solve: status is SOLVED, UNSOLVABLE, or
+    GAVE_UP (with the reason), and stats the work done.  True
+    exactly when solved, so it can be used like the bool solve
+    used to return.
+    """
+    SOLVED = "solved"
+    UNSOLVABLE = "unsolvable"
+    GAVE_UP = "gave up"
+
+    def __init__(self, status: str, stats: SearchStats, reason: str = None):
+        self.status = status
+        self.stats = stats
+        self.reason = reason
+
+    def __bool__(self) -> bool:
+        return self.status == Result.SOLVED
+
+    def __str__(self) -> str:
+        status = self.status
+        if self.reason:
+            status = "{} ({})".format(status, self.reason)
+        return "{}: {}".format(status, self.stats)
+
+
+class Agenda(object):
+    """The work lists of propagate: groups waiting for the singles
+    (pending) and for the subset tactics (slow), intersections
+    waiting for pointing and box-line tactics (crossings), and
+    whether fish and chains should be looked for.  Kept apart from
+    propagate so that a propagation cut short by its budget can
+    carry on where it stopped.  Arguments are as for propagate.
+    """
+
+    def __init__(self, units: Iterable[int] = None, subsets: int = 0,
+                 intersections: bool = False, fish: int = 0,
+                 chains: bool = False):
+        self.queued = [False] * sdk_topology.NUNITS
+        self.pending = deque()
+        self.crossed = [False] * len(sdk_topology.INTERSECTIONS)
+        self.crossings = deque()
+        self.stale = [False] * sdk_topology.NUNITS
+        self.slow = deque()
+        if intersections:
+            # Those where the units to look at meet others may have
+            # something to offer
+            if units is None:
+                for k in range(len(self.crossed)):
+                    self.crossed[k] = True
+                    self.crossings.append(k)
+            else:
+                units = list(units)
+                for unit in units:
+                    for cell in sdk_topology.UNIT_CELLS[unit]:
+                        self.cross(cell)
+        if units is None:
+            units = range(sdk_topology.NUNITS)
+        for unit in units:
+            self.queue(unit, subsets)
+        # Whether the board has changed since we last looked for
+        # fish or chains
+        self.fishing = fish >= 2
+        self.chaining = chains
+
+    def queue(self, unit: int, subsets: int):
+        """Give unit a look by the singles, and by the subset
+        tactics if there are any
+        """
+        if not self.queued[unit]:
+            self.queued[unit] = True
+            self.pending.append(unit)
+        if subsets and not self.stale[unit]:
+            self.stale[unit] = True
+            self.slow.append(unit)
+
+    def cross(self, cell: int):
+        """Give the intersections through cell a look"""
+        crossed = self.crossed
+        for k in sdk_topology.CELL_INTERSECTIONS[cell]:
+            if not crossed[k]:
+                crossed[k] = True
+                self.crossings.append(k)
+
+
+def propagate(board: Board, units: Iterable[int] = None,
+              subsets: int = 0, intersections: bool = False,
+              fish: int = 0, chains: bool = False,
+              budget: Budget = None, agenda: Agenda = None) -> bool:
     """Propagate constraints until we either solve the puzzle,
     show the puzzle as given is unsolvable, or can make no more
     progress by constraint propagation.
+
+    Rather than sweeping all 27 groups until nothing changes, we
+    keep a work list of groups that may have something new to
+    offer.  Every group gets one initial look; after that a group
+    is revisited only when one of its tiles has changed, as
+    recorded in the board's journal.
+
+    If units is given, the rest of the board is assumed to be
+    propagated already and only those units get the initial look.
+    With intersections, pointing pairs and box-line reduction
+    are applied where blocks meet lines, once the singles have
+    nothing left to do.  With subsets 2 to 4, naked and hidden
+    subsets up to that size are applied too.  They cost more, so
+    a group gets them only once the other tactics have nothing
+    left to do, and again only if it has changed since.  Last,
+    with fish 2 to 4, X-Wings and larger fish up to that size are
+    looked for across the whole board, whenever anything else
+    has changed it since the last look.  With chains, when all
+    else fails we look for a nice loop or forcing chain (see
+    sdk_chains), within its budget of steps.
+
+    If budget is given, it is checked after every step (and by
+    the chain search), and BudgetExceeded raised if it runs out.
+    The work lists are then left in agenda, if one was given in
+    place of units, and another call with it carries on; each
+    step finished counts as progress for the budget.
+    Returns False if the board was found to be inconsistent.
     """
     logging.info("Propagating constraints")
-    changed = True
-    while changed:
-        logging.info("Invoking naked single")
-        changed = naked_single(board)
-        if board.is_solved() or not board.is_consistent():
-            return
-        changed = hidden_single(board) or changed
-        if board.is_solved() or not board.is_consistent():
-            return
-    return
-
-
-def solve(board: Board) -> bool:
-    """Main solver.  Initially this just invokes constraint
-    propagation.  In part 2 of the project, you will add
-    recursive back-tracking search (guess-and-check with recursion).
-    A complete solution for solve for part 2 will
-    - find the the best tile to guess values for
-    - guess each possible value for that tile
-    - if a guess is wrong, reset the board
-    - return True if the board is solved, false otherwise
+    groups = board.groups
+    journal = board.journal
+    # Steps count as progress only if the caller keeps them
+    keeping = agenda is not None
+    if agenda is None:
+        agenda = Agenda(units, subsets, intersections, fish, chains)
+    queued = agenda.queued
+    pending = agenda.pending
+    crossed = agenda.crossed
+    crossings = agenda.crossings
+    stale = agenda.stale
+    slow = agenda.slow
+    fishing = agenda.fishing
+    chaining = agenda.chaining
+    check = None if budget is None else budget.check
+    while pending or crossings or slow or fishing or chaining:
+        mark = len(journal)
+        if pending:
+            unit = pending.popleft()
+            queued[unit] = False
+            group = groups[unit]
+            # Every group that changed is queued, so this also
+            # catches any inconsistency before we finish
+            if not group.is_consistent():
+                return False
+            # Listeners hear about each step once, not each elimination
+            with Batch():
+                group.naked_single_constrain()
+                group.hidden_single_constrain()
+        elif crossings:
+            k = crossings.popleft()
+            crossed[k] = False
+            intersection = board.intersections[k]
+            with Batch():
+                intersection.pointing_constrain()
+                intersection.box_line_constrain()
+        elif slow:
+            unit = slow.popleft()
+            stale[unit] = False
+            group = groups[unit]
+            with Batch():
+                # Smallest subsets first; after any change the
+                # singles get another turn before we go on
+                for size in range(2, subsets + 1):
+                    if (group.naked_subset_constrain(size)
+                            or group.hidden_subset_constrain(size)):
+                        break
+        elif fishing:
+            fishing = False
+            with Batch():
+                for size in range(2, fish + 1):
+                    if basic_fish(board, size):
+                        break
+        else:
+            # Should the chain search be cut short, the agenda
+            # still says to look for chains
+            chaining = False
+            with Batch():
+                sdk_chains.chains(board, check=check)
+        for index in range(mark, len(journal)):
+            cell = journal[index][0].index
+            for affected in sdk_topology.CELL_UNITS[cell]:
+                if not queued[affected]:
+                    queued[affected] = True
+                    pending.append(affected)
+                if subsets and not stale[affected]:
+                    stale[affected] = True
+                    slow.append(affected)
+            if intersections:
+                for k in sdk_topology.CELL_INTERSECTIONS[cell]:
+                    if not crossed[k]:
+                        crossed[k] = True
+                        crossings.append(k)
+        if len(journal) > mark:
+            fishing = fish >= 2
+            chaining = chains
+        if check is not None:
+            agenda.fishing = fishing
+            agenda.chaining = chaining
+            if keeping:
+                budget.progressed = True
+            check()
+    return True
+
+
+def solve(board: Board, subsets: int = 0, intersections: bool = False,
+          fish: int = 0, chains: bool = False, probe: bool = False,
+          choose: str = "mrv", order: str = "natural", seed: int = 0,
+          stats: SearchStats = None, timeout: float = None,
+          max_nodes: int = None, cancel: Cancel = None) -> Result:
+    """Main solver.  Propagates constraints, and when that
+    stalls, guesses a value for the best tile and propagates
+    again, rolling the board back through its journal when a
+    guess leads to a contradiction.  The guesses are kept on the
+    explicit stack of a Search rather than in recursive calls.
+
+    subsets, intersections, fish, and chains are passed on to
+    propagate.  With probe, each value of the tile to guess is
+    first tried out by propagation alone (see _probe).  choose,
+    order, and seed select the branching heuristics (see
+    Branching).  If stats is given, the work done is added to it.
+
+    The solver gives up after timeout seconds, after max_nodes
+    guesses, or when cancel is cancelled, if given.  The Result
+    says which, and is true only if the board was solved.
     """
     log.debug("Called solve on board:\n{}".format(board))
-    propagate(board)
-    if board.is_solved():
-        return True
-    if not board.is_consistent():
-        return False
-
-    log.info("Invoking back-track search")
-    # There must be at least one tile with value UNKNOWN
-    # and multiple candidate values.  Choose one with
-    # fewest candidates.
+    budget = None
+    if timeout is not None or cancel is not None:
+        budget = Budget(timeout, cancel)
+    search = Search(board, subsets=subsets, intersections=intersections,
+                    fish=fish, chains=chains, probe=probe, choose=choose,
+                    order=order, seed=seed, stats=stats)
+    solved = search.run(max_nodes, budget)
+    if solved is None:
+        return Result(Result.GAVE_UP, search.stats, search.reason)
+    if solved:
+        return Result(Result.SOLVED, search.stats)
+    return Result(Result.UNSOLVABLE, search.stats)
+
+
+def _probe(board: Board, tile: sdk_tile.Tile, options: Dict,
+           stats: SearchStats) -> Optional[List[str]]:
+    """Try each value of tile by propagation alone, undoing each
+    try.  Values that fail are eliminated (and the elimination
+    propagated) without branching; the rest are returned, those
+    that changed the board most first, since they leave the least
+    to search.  None if the board is inconsistent.
+    """
+    checkpoint = board.checkpoint()
+    journal = board.journal
+    failed = 0
+    tried = []
+    for guess in sdk_tile.MASK_CHOICES[tile.mask]:
+        tile.set_value(guess)
+        stats.probes += 1
+        consistent = propagate(board, sdk_topology.CELL_UNITS[tile.index],
+                               **options)
+        changes = len(journal) - checkpoint
+        with Batch():
+            board.undo(checkpoint)
+        if consistent:
+            tried.append((-changes, guess))
+        else:
+            failed |= sdk_tile.BIT[guess]
+    if failed:
+        log.info("Probing rules out {} for tile[{}][{}]".format(
+            "".join(sdk_tile.MASK_CHOICES[failed]), tile.row, tile.col))
+        tile.eliminate_mask(failed)
+        if not propagate(board, sdk_topology.CELL_UNITS[tile.index], **options):
+            return None
+    tried.sort()
+    return [guess for _, guess in tried if tile.mask & sdk_tile.BIT[guess]]
+
+
+def choose_tile(board: Board) -> Optional[sdk_tile.Tile]:
+    """An UNKNOWN tile with the fewest candidates, or None"""
     min_candidates = len(sdk_tile.CHOICES) + 1
     best_tile = None
     for row in board.tiles:
         for tile in row:
-            if (tile.value == sdk_tile.UNKNOWN) and (len(tile.candidates) < min_candidates):
-                min_candidates = len(tile.candidates)
+            if (tile.value == sdk_tile.UNKNOWN) and (sdk_tile.POPCOUNT[tile.mask] < min_candidates):
+                min_candidates = sdk_tile.POPCOUNT[tile.mask]
                 best_tile = tile
+    return best_tile
 
-    assert not (best_tile is None)  # best_tile should never be None. If it is, we've made a mistake
 
-    log.info("Guess-and-check on tile[{}][{}]".format(best_tile.row, best_tile.col))
-    saved = board.as_list()
-    for guess in best_tile.candidates:
-        best_tile.set_value(guess)
+def choose_tile_degree(board: Board) -> Optional[sdk_tile.Tile]:
+    """An UNKNOWN tile with the fewest candidates, and of those
+    the one with the most UNKNOWN peers, or None
+    """
+    popcount = sdk_tile.POPCOUNT
+    flat = [tile for row in board.tiles for tile in row]
+    open_tiles = [tile for tile in flat if tile.value == sdk_tile.UNKNOWN]
+    if not open_tiles:
+        return None
+    fewest = min(popcount[tile.mask] for tile in open_tiles)
+    best_tile = None
+    best_degree = -1
+    for tile in open_tiles:
+        if popcount[tile.mask] != fewest:
+            continue
+        degree = 0
+        for peer in sdk_topology.PEERS[tile.index]:
+            if flat[peer].value == sdk_tile.UNKNOWN:
+                degree += 1
+        if degree > best_degree:
+            best_tile = tile
+            best_degree = degree
+    return best_tile
+
+
+def choose_tile_in_unit(board: Board) -> Optional[sdk_tile.Tile]:
+    """In the group with the fewest UNKNOWN tiles (but some),
+    the tile with the fewest candidates, or None
+    """
+    best_group = None
+    fewest = len(sdk_tile.CHOICES) + 1
+    for group in board.groups:
+        count = 0
+        for tile in group.tiles:
+            if tile.value == sdk_tile.UNKNOWN:
+                count += 1
+        if 0 < count < fewest:
+            best_group = group
+            fewest = count
+    if best_group is None:
+        return None
+    open_tiles = [tile for tile in best_group.tiles
+                  if tile.value == sdk_tile.UNKNOWN]
+    return min(open_tiles, key=lambda tile: sdk_tile.POPCOUNT[tile.mask])
+
+
+def natural_order(board: Board, tile: sdk_tile.Tile,
+                  rng: random.Random) -> Sequence[str]:
+    """Values of tile in the order of CHOICES"""
+    return sdk_tile.MASK_CHOICES[tile.mask]
+
+
+def least_constraining_order(board: Board, tile: sdk_tile.Tile,
+                             rng: random.Random) -> Sequence[str]:
+    """Values of tile that rule out the fewest candidates of
+    its UNKNOWN peers first
+    """
+    flat = [other for row in board.tiles for other in row]
+    peers = [flat[peer] for peer in sdk_topology.PEERS[tile.index]
+             if flat[peer].value == sdk_tile.UNKNOWN]
+
+    def ruled_out(value: str) -> int:
+        bit = sdk_tile.BIT[value]
+        return sum(1 for peer in peers if peer.mask & bit)
+
+    return sorted(sdk_tile.MASK_CHOICES[tile.mask], key=ruled_out)
+
+
+def random_order(board: Board, tile: sdk_tile.Tile,
+                 rng: random.Random) -> Sequence[str]:
+    """Values of tile in an order drawn from rng"""
+    values = list(sdk_tile.MASK_CHOICES[tile.mask])
+    rng.shuffle(values)
+    return values
+
+
+# Heuristics for the tile to guess, and the order of its values
+CHOOSERS: Dict[str, Callable[[Board], Optional[sdk_tile.Tile]]] = {
+    "mrv": choose_tile,
+    "mrv-degree": choose_tile_degree,
+    "unit": choose_tile_in_unit,
+}
+ORDERS: Dict[str, Callable[[Board, sdk_tile.Tile, random.Random],
+                           Sequence[str]]] = {
+    "natural": natural_order,
+    "lcv": least_constraining_order,
+    "random": random_order,
+}
+
+
+class Branching(object):
+    """How the search branches: the tile to guess (a heuristic
+    from CHOOSERS) and the order to try its values in (from
+    ORDERS, or by probing).  Random orders are drawn from a
+    generator seeded with seed, so a search can be repeated
+    exactly.
+    """
+
+    def __init__(self, choose: str = "mrv", order: str = "natural",
+                 seed: int = 0, probe: bool = False):
+        self.choose = choose
+        self.order = order
+        self.seed = seed
+        self.probe = probe
+        self._tile = CHOOSERS[choose]
+        self._values = ORDERS[order]
+        self.rng = random.Random(seed)
+
+    def tile(self, board: Board) -> Optional[sdk_tile.Tile]:
+        return self._tile(board)
+
+    def values(self, board: Board, tile: sdk_tile.Tile) -> Sequence[str]:
+        return self._values(board, tile, self.rng)
+
+
+# ---------------------------------
+# Search with an explicit stack
+# ---------------------------------
+
+class Frame(object):
+    """One level of the search: the tile guessed, the journal
+    checkpoint that takes the board back to before the guess,
+    and the values to try, of which next is the next one
+    """
+    __slots__ = ("cell", "checkpoint", "guesses", "next")
+
+    def __init__(self, cell: int, checkpoint: int, guesses: str,
+                 next: int = 0):
+        self.cell = cell
+        self.checkpoint = checkpoint
+        self.guesses = guesses
+        self.next = next
+
+
+class Search(object):
+    """Back-track search on board with an explicit stack of
+    Frames in place of recursion.  Everything else a level needs
+    is in the board's journal, so the memory for each level is
+    small and fixed.  run can stop after a number of guesses and
+    be called again to carry on; state and restore let the rest
+    of the search be done later, even in another process.
+    Keyword arguments are as for solve.
+    """
+
+    def __init__(self, board: Board, subsets: int = 0,
+                 intersections: bool = False, fish: int = 0,
+                 chains: bool = False, probe: bool = False,
+                 choose: str = "mrv", order: str = "natural", seed: int = 0,
+                 stats: SearchStats = None):
+        self.board = board
+        self.options = {"subsets": subsets, "intersections": intersections,
+                        "fish": fish, "chains": chains}
+        self.branching = Branching(choose, order, seed, probe)
+        self.stats = SearchStats() if stats is None else stats
+        self.frames: List[Frame] = []
+        # The journal before this point is not ours to undo
+        self.base = board.checkpoint()
+        # None until solved (True) or shown unsolvable (False)
+        self.status: Optional[bool] = None
+        self.started = False
+        # Why run last stopped short, if it did
+        self.reason: Optional[str] = None
+        # The work lists of a propagation under way, if any
+        self.agenda: Optional[Agenda] = None
+        # Whether the board is propagated and waits for a new guess
+        self.expand = True
+
+    def run(self, max_nodes: int = None,
+            budget: Budget = None) -> Optional[bool]:
+        """Search until the board is solved (True) or shown to be
+        unsolvable (False), or, if max_nodes is given, until that
+        many more guesses have been tried, or budget runs out
+        (None, with the reason in self.reason).
+
+        A propagation cut short by the budget is kept, with its
+        work lists, and finished by the next run; a probe or chain
+        search cut short is done again.  So that every run makes
+        progress, the time limit applies only once it has kept
+        something (see Budget), and a run may overrun by a probe
+        or chain search.
+        """
+        board = self.board
+        frames = self.frames
+        stats = self.stats
+        self.reason = None
+        if self.status is not None:
+            return self.status
+        limit = None if max_nodes is None else stats.nodes + max_nodes
+        tactics = dict(self.options, budget=budget)
+        if budget is not None:
+            budget.progressed = False
+        while True:
+            mark = board.checkpoint()
+            expand = self.expand
+            depth = len(frames)
+            position = frames[-1].next if frames else 0
+            counts = (stats.nodes, stats.backtracks, stats.probes)
+            try:
+                if budget is not None:
+                    budget.check()
+                done = self._step(limit, tactics)
+            except BudgetExceeded as stop:
+                self.reason = stop.reason
+                if self.agenda is not None:
+                    # Propagation carries on from its work lists
+                    return None
+                with Batch():
+                    board.undo(mark)
+                self.expand = expand
+                del frames[depth:]
+                if frames:
+                    frames[-1].next = position
+                stats.nodes, stats.backtracks, stats.probes = counts
+                return None
+            if done is not None or self.reason is not None:
+                return done
+            if budget is not None:
+                budget.progressed = True
+
+    def _step(self, limit: Optional[int], tactics: Dict) -> Optional[bool]:
+        """One step of run: the initial propagation, a new level,
+        a guess, or a backtrack, propagating with tactics.  True or
+        False when the search is over; sets self.reason when the
+        node limit is reached.
+        """
+        board = self.board
+        stats = self.stats
+        frames = self.frames
+        if self.agenda is not None:
+            # Finish a propagation that was cut short
+            return self._propagated(propagate(board, agenda=self.agenda,
+                                              **tactics))
+        if not self.started:
+            self.agenda = Agenda(None, **self.options)
+            return self._propagated(propagate(board, agenda=self.agenda,
+                                              **tactics))
+        if self.expand:
+            branching = self.branching
+            tile = branching.tile(board)
+            # If there is nothing to guess, the board is solved.
+            if tile is None:
+                self.status = True
+                return True
+            if branching.probe:
+                guesses = _probe(board, tile, tactics, stats)
+                if guesses is None:
+                    self.expand = False
+                    return self._backtrack()
+                if tile.value != sdk_tile.UNKNOWN:
+                    # Probing ruled out all but one value; no need to guess
+                    return None
+            else:
+                guesses = branching.values(board, tile)
+            log.info("Guess-and-check on tile[{}][{}]".format(tile.row, tile.col))
+            frames.append(Frame(tile.index, board.checkpoint(),
+                                "".join(guesses)))
+            self.expand = False
+        frame = frames[-1]
+        if frame.next == len(frame.guesses):
+            # No value worked, so the guess that led here was wrong
+            frames.pop()
+            return self._backtrack()
+        if limit is not None and stats.nodes >= limit:
+            self.reason = "node limit"
+            return None
+        guess = frame.guesses[frame.next]
+        frame.next += 1
+        tile = board.tiles[frame.cell // 9][frame.cell % 9]
+        tile.set_value(guess)
         log.info("Guessing {}".format(guess))
-        if solve(board):
-            return True
+        stats.nodes += 1
+        self.agenda = Agenda(sdk_topology.CELL_UNITS[frame.cell], **self.options)
+        return self._propagated(propagate(board, agenda=self.agenda, **tactics))
+
+    def _propagated(self, consistent: bool) -> Optional[bool]:
+        """Carry on once the propagation in self.agenda is done:
+        False if the initial propagation showed the board
+        unsolvable, else None
+        """
+        self.agenda = None
+        if not self.started:
+            self.started = True
+            if not consistent:
+                self.status = False
+                return False
+        elif consistent:
+            self.expand = True
+        else:
+            # That guess didn't work. Roll back and try again
+            self.stats.backtracks += 1
+            with Batch():
+                self.board.undo(self.frames[-1].checkpoint)
+        return None
+
+    def _backtrack(self) -> Optional[bool]:
+        """Roll back the guess in the innermost frame: None, or
+        False (with status set) if there is none, so that the
+        board is unsolvable
+        """
+        if not self.frames:
+            self.status = False
+            return False
+        self.stats.backtracks += 1
+        with Batch():
+            self.board.undo(self.frames[-1].checkpoint)
+        return None
+
+    def state(self) -> Dict:
+        """The state of the search, from which restore can carry
+        on.  The board is packed as by dump_candidates (with the
+        values as a string, since they may lag the candidates part
+        way through a propagation), and the journal since the
+        search began becomes a trail of (cell, value, mask) entries.
+        All of it can be pickled.
+        """
+        board = self.board
+        branching = self.branching
+        stats = self.stats
+        return {
+            "values": "".join(board.as_list()),
+            "board": board.dump_candidates(),
+            "trail": [(tile.index, value, mask)
+                      for tile, value, mask in board.journal[self.base:]],
+            "frames": [(frame.cell, frame.checkpoint - self.base,
+                        frame.guesses, frame.next) for frame in self.frames],
+            "agenda": copy.deepcopy(self.agenda),
+            "options": dict(self.options),
+            "branching": (branching.choose, branching.order,
+                          branching.seed, branching.probe),
+            "rng": branching.rng.getstate(),
+            "stats": (stats.nodes, stats.backtracks, stats.probes),
+            "status": self.status,
+            "started": self.started,
+            "expand": self.expand,
+        }
 
-        # That guess didn't work. Restore old board and try again
-        board.set_tiles(saved)
+    @classmethod
+    def restore(cls, board: Board, state: Dict,
+                stats: SearchStats = None) -> "Search":
+        """Load the board saved in state and the search on it.
+        The counts saved in state are added to stats if given.
+        """
+        board.load_candidates(state["board"])
+        tiles = [tile for row in board.tiles for tile in row]
+        # Part way through a propagation, a tile may be down to
+        # one candidate without having been given it as its value
+        for tile, value in zip(tiles, state["values"]):
+            if tile.value != value:
+                tile.restore(value, tile.mask)
+        board.journal.extend((tiles[cell], value, mask)
+                             for cell, value, mask in state["trail"])
+        choose, order, seed, probe = state["branching"]
+        search = cls(board, probe=probe, choose=choose, order=order,
+                     seed=seed, stats=stats, **state["options"])
+        search.base = 0
+        search.branching.rng.setstate(state["rng"])
+        nodes, backtracks, probes = state["stats"]
+        search.stats.nodes += nodes
+        search.stats.backtracks += backtracks
+        search.stats.probes += probes
+        search.frames = [Frame(*frame) for frame in state["frames"]]
+        search.agenda = copy.deepcopy(state["agenda"])
+        search.status = state["status"]
+        search.started = state["started"]
+        search.expand = state["expand"]
+        return search
 
-    return False
 
+# ---------------------------------
+# Counting solutions
+# ---------------------------------
+
+def count_solutions(board: Board, limit: int = 2) -> int:
+    """The number of solutions of board, counting no further
+    than limit.  Uses the same propagation and journal as solve,
+    and leaves the board as it found it.
+    """
+    checkpoint = board.checkpoint()
+    try:
+        if not propagate(board):
+            return 0
+        return _count(board, limit)
+    finally:
+        with Batch():
+            board.undo(checkpoint)
+
+
+def is_unique(board: Board) -> bool:
+    """Does board have exactly one solution?"""
+    return count_solutions(board, limit=2) == 1
+
+
+def _count(board: Board, limit: int) -> int:
+    """Solutions of a propagated, consistent board, up to limit"""
+    best_tile = choose_tile(board)
+    if best_tile is None:
+        return 1
+    count = 0
+    checkpoint = board.checkpoint()
+    for guess in sdk_tile.MASK_CHOICES[best_tile.mask]:
+        best_tile.set_value(guess)
+        if propagate(board, sdk_topology.CELL_UNITS[best_tile.index]):
+            count += _count(board, limit - count)
+        with Batch():
+            board.undo(checkpoint)
+        if count >= limit:
+            break
+    return count
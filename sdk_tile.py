@@ -5,10 +5,10 @@ Each tile may belong to more than one group
 (nonet), and be constrained by selected values
 of other tiles in any of its groups.
 """
-from typing import Set
+from typing import Set, FrozenSet, Iterable
 
 # MVC listener interface definition
-from events import Event, Listener
+from events import Event, Listener, deliver
 
 import logging
 logging.basicConfig()
@@ -22,6 +22,31 @@ CHOICES = ['1', '2', '3', '4', '5',
            '6', '7', '8', '9']
 UNKNOWN = '.'
 
+# Internally the candidates of a tile are kept as a
+# 9-bit integer mask, bit i standing for CHOICES[i].
+# The tables below are indexed by mask, so that counting
+# or listing candidates is a single lookup.
+ALL_CANDIDATES = (1 << len(CHOICES)) - 1
+BIT = {choice: 1 << i for i, choice in enumerate(CHOICES)}
+POPCOUNT = tuple(bin(mask).count("1")
+                 for mask in range(ALL_CANDIDATES + 1))
+MASK_CHOICES = tuple(tuple(choice for choice in CHOICES if mask & BIT[choice])
+                     for mask in range(ALL_CANDIDATES + 1))
+MASK_SETS = tuple(frozenset(choices) for choices in MASK_CHOICES)
+MASK_BITS = tuple(tuple(BIT[choice] for choice in choices)
+                  for choices in MASK_CHOICES)
+
+
+def mask_of(choices: Iterable[str]) -> int:
+    """The candidate mask for a collection of choices.
+    Symbols that are not in CHOICES are ignored.
+    """
+    mask = 0
+    for choice in choices:
+        mask |= BIT.get(choice, 0)
+    return mask
+
+
 # -------------------------------
 # Interface for listeners
 #  (Notes on design decision at end of this file)
@@ -51,12 +76,17 @@ class TileEvent(Event):
 
 class TileChanged(TileEvent):
     """Something has changed, either value or candidates"""
-    pass
+
+    # A later change to a tile supersedes earlier ones
+    def coalesce_key(self) -> object:
+        return self.tile
 
 
 class TileGuessed(TileEvent):
     """This value change is a guess by the back-track solver"""
-    pass
+
+    def coalesce_key(self) -> object:
+        return self.tile
 
 
 class TileAttend(TileEvent):
@@ -83,33 +113,54 @@ class Tile(object):
     """One tile on the Sudoku grid.
     Public attributes (read-only): value, which will be either
     UNKNOWN or an element of CHOICES; candidates, which will
-    be a set drawn from CHOICES.  If value is an element of
+    be a set drawn from CHOICES; mask, the same candidates as
+    a bit mask (see BIT).  If value is an element of
     CHOICES,then candidates will be the singleton containing
     value.  If candidates is empty, then no tile value can
     be consistent with other tile values in the grid.
 
     value and candidates are public read-only attributes; change them
     only through the access methods set_value and eliminate.
+    The cell index row * 9 + col is kept as index, for use
+    with the tables in sdk_topology.
+
+    A board may give its tiles a shared journal (a list); each
+    tile then appends (tile, old value, old mask) to the journal
+    whenever its value or candidates change, so that the solver
+    can tell which tiles a tactic has touched and the board can
+    undo changes (see Board.undo).
     """
+    __slots__ = ("row", "col", "index", "listeners", "scanners",
+                 "value", "mask", "journal")
 
     def __init__(self, row: int, col: int, value=UNKNOWN):
         assert value == UNKNOWN or value in CHOICES
         self.row = row
         self.col = col
+        self.index = row * 9 + col
         self.listeners = []
+        self.scanners = []
         self.value = ""
-        self.candidates = set()
+        self.mask = 0
+        self.journal = None
 
         self.set_value(value)
 
     def add_listener(self, listener: TileListener):
-        """Listener will be notified of changes"""
+        """Listener will be notified of changes, and also of
+        attend and unattend if listener.scan is True
+        """
         self.listeners.append(listener)
+        if getattr(listener, "scan", False):
+            self.scanners.append(listener)
 
     def notify_all(self, event: TileEvent):
-        """Notify each MVC listener that something has happened"""
+        """Notify each MVC listener that something has happened.
+        Callers check self.listeners first, so that no event
+        object is built when nobody is listening.
+        """
         for listener in self.listeners:
-            listener.notify(event)
+            deliver(listener, event)
 
     def __str__(self) -> str:
         return self.value
@@ -117,23 +168,43 @@ class Tile(object):
     def __repr__(self) -> str:
         return "Tile({},{},'{}')".format(self.row, self.col, self.value)
 
+    @property
+    def candidates(self) -> FrozenSet[str]:
+        """Read-only set view of the candidate mask"""
+        return MASK_SETS[self.mask]
+
     def set_value(self, value, guess=False):
         if value in CHOICES:
-            self.value = value
-            self.candidates = {value}
+            mask = BIT[value]
         else:
-            self.value = UNKNOWN
-            self.candidates = set(CHOICES)
+            value = UNKNOWN
+            mask = ALL_CANDIDATES
+        if self.journal is not None and (value != self.value or
+                                         mask != self.mask):
+            self.journal.append((self, self.value, self.mask))
+        self.value = value
+        self.mask = mask
+        if not self.listeners:
+            return
         if guess:
             self.notify_all(TileGuessed(self))
         else:
             self.notify_all(TileChanged(self))
 
+    def restore(self, value: str, mask: int):
+        """Put back a state recorded in the journal (or saved
+        some other way).  This is not itself journaled.
+        """
+        self.value = value
+        self.mask = mask
+        if self.listeners:
+            self.notify_all(TileChanged(self))
+
     def could_be(self, value: str) -> bool:
         """Could this tile take the value
         return value in self.candidates
         """
-        return value in self.candidates
+        return bool(self.mask & BIT.get(value, 0))
 
     def eliminate(self, choices: Set[str]) -> bool:
         """
@@ -143,33 +214,40 @@ class Tile(object):
         - notify all if the tile has changed
         - return True if any either the tiles candidates or value has changed, False otherwise
         """
-        #  Careful! If you want to compare the value
-        # of candidates before and after the operation,
-        # you'll need to make a *copy* of the set, because
-        # sets are mutable!
-
-        old_candidates = self.candidates.copy()
-        self.candidates -= choices
+        return self.eliminate_mask(mask_of(choices))
 
+    def eliminate_mask(self, mask: int) -> bool:
+        """Like eliminate, but with the choices given as a bit mask"""
+        remaining = self.mask & ~mask
         # If nothing changed, we're done here. Return False
-        if old_candidates == self.candidates:
+        if remaining == self.mask:
             return False
+        if self.journal is not None:
+            self.journal.append((self, self.value, self.mask))
+        self.mask = remaining
 
         # If there is only one value that the tile could be, make it that value
-        if len(self.candidates) == 1:
-            self.set_value(self.candidates.pop())
+        if POPCOUNT[remaining] == 1:
+            self.set_value(MASK_CHOICES[remaining][0])
 
         # Something changed, so notify and return True
-        self.notify_all(TileChanged(self))
+        if self.listeners:
+            self.notify_all(TileChanged(self))
         return True
 
     def attend(self):
         """This tile is currently an object of attention"""
-        self.notify_all(TileAttend(self))
+        if self.scanners:
+            event = TileAttend(self)
+            for listener in self.scanners:
+                deliver(listener, event)
 
     def unattend(self):
         """Done attending to this tile"""
-        self.notify_all(TileUnattend(self))
+        if self.scanners:
+            event = TileUnattend(self)
+            for listener in self.scanners:
+                deliver(listener, event)
 
 # Design notes:
 #    We want different kinds of tile events to guide
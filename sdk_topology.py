@@ -0,0 +1,77 @@
+"""
+The fixed shape of a Sudoku board: which cells make up
+each row, column, and block ("unit"), which units each
+cell belongs to, and which other cells ("peers") share
+a unit with it.
+
+Cells are numbered 0..80 as row * 9 + col.  Units are
+numbered 0..26 in the order Board.groups uses: rows 0..8,
+then columns 9..17, then blocks 18..26.  All tables are
+tuples of ints built once when the module is imported.
+"""
+
+from typing import Tuple
+
+NCELLS = 81
+NUNITS = 27
+
+ROW_OF = tuple(cell // 9 for cell in range(NCELLS))
+COL_OF = tuple(cell % 9 for cell in range(NCELLS))
+BLOCK_OF = tuple(3 * (cell // 27) + (cell % 9) // 3 for cell in range(NCELLS))
+
+
+def _unit_cells() -> Tuple[Tuple[int, ...], ...]:
+    rows = [tuple(row * 9 + col for col in range(9)) for row in range(9)]
+    cols = [tuple(row * 9 + col for row in range(9)) for col in range(9)]
+    blocks = [tuple(cell for cell in range(NCELLS) if BLOCK_OF[cell] == block)
+              for block in range(9)]
+    return tuple(rows + cols + blocks)
+
+
+# unit -> the 9 cells of that unit
+UNIT_CELLS = _unit_cells()
+
+# unit -> title used for the corresponding Group
+UNIT_TITLES = tuple(["Row {}".format(row + 1) for row in range(9)]
+                    + ["Column {}".format(col) for col in range(9)]
+                    + ["Block from {},{}".format(row, col)
+                       for row in range(3) for col in range(3)])
+
+# cell -> its (row, column, block) units
+CELL_UNITS = tuple((ROW_OF[cell], 9 + COL_OF[cell], 18 + BLOCK_OF[cell])
+                   for cell in range(NCELLS))
+
+# cell -> the 20 other cells that share a unit with it
+PEERS = tuple(tuple(sorted({peer for unit in CELL_UNITS[cell]
+                            for peer in UNIT_CELLS[unit]} - {cell}))
+              for cell in range(NCELLS))
+
+
+def _intersections() -> Tuple[Tuple[int, int, Tuple[int, ...],
+                                    Tuple[int, ...], Tuple[int, ...]], ...]:
+    result = []
+    for block in range(9):
+        block_unit = 18 + block
+        block_cells = set(UNIT_CELLS[block_unit])
+        lines = ([3 * (block // 3) + k for k in range(3)]
+                 + [9 + 3 * (block % 3) + k for k in range(3)])
+        for line in lines:
+            line_cells = set(UNIT_CELLS[line])
+            result.append((block_unit, line,
+                           tuple(sorted(block_cells & line_cells)),
+                           tuple(sorted(block_cells - line_cells)),
+                           tuple(sorted(line_cells - block_cells))))
+    return tuple(result)
+
+
+# Each of the 54 places where a block meets a row or column:
+# (block unit, line unit, the 3 cells in both,
+#  the 6 cells only in the block, the 6 cells only in the line)
+INTERSECTIONS = _intersections()
+
+# cell -> the intersections whose 15 cells include it
+CELL_INTERSECTIONS = tuple(
+    tuple(k for k, (_, _, common, block_only, line_only)
+          in enumerate(INTERSECTIONS)
+          if cell in common or cell in block_only or cell in line_only)
+    for cell in range(NCELLS))
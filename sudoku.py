@@ -1,18 +1,29 @@
 """Sudoku solver with optional displays"""
 
 import argparse
+import os
+import sys
+from functools import partial
+from typing import Callable
 
 import sdk_board
-import sdk_display
-import sdk_debugview
 import sdk_solver
+import sdk_dlx
 import sdk_io
+import sdk_batch
 
 import logging
 logging.basicConfig()
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 
+# Solving engines: the explainable tactics-and-search solver,
+# and a fast exact-cover solver for bulk work
+ENGINES = {"search": sdk_solver.solve,
+           "dlx": sdk_dlx.solve}
+# The vectorized engine needs NumPy, so it is loaded only on request
+VECTOR_ENGINES = ["numpy"]
+
 
 def cli() -> object:
     """Get arguments from command line"""
@@ -24,22 +35,89 @@ def cli() -> object:
                         action="store_true")
     parser.add_argument("-t", "--text", help="Text monitor progress",
                         action="store_true")
-    parser.add_argument("file", type=argparse.FileType('r'))
+    parser.add_argument("-e", "--engine", help="Solving engine",
+                        choices=sorted(ENGINES) + VECTOR_ENGINES,
+                        default="search")
+    parser.add_argument("-b", "--batch",
+                        help="Solve every puzzle in the given files and "
+                             "directories (implied by several files or a "
+                             "directory)",
+                        action="store_true")
+    parser.add_argument("-o", "--output", help="Batch results file",
+                        type=argparse.FileType('w'), default=sys.stdout)
+    parser.add_argument("-l", "--lines",
+                        help="Write batch results one puzzle per line",
+                        action="store_true")
+    parser.add_argument("-j", "--jobs", help="Batch worker processes",
+                        type=int, default=1)
+    parser.add_argument("-u", "--unordered",
+                        help="Write batch results as they finish, "
+                             "labeled with input position",
+                        action="store_true")
+    parser.add_argument("--start", help="Skip batch puzzles before "
+                        "this input position (to resume a batch)",
+                        type=int, default=0)
+    parser.add_argument("--timeout", help="Give up on a puzzle after this "
+                        "many seconds (search engine only)", type=float)
+    parser.add_argument("files", nargs="+", metavar="file")
 
     args = parser.parse_args()
+    if args.timeout is not None and args.engine != "search":
+        parser.error("--timeout only works with --engine search")
+    if len(args.files) > 1 or os.path.isdir(args.files[0]):
+        args.batch = True
+    # Options that only make sense for a batch imply one
+    if args.lines or args.jobs > 1 or args.unordered or args.start:
+        args.batch = True
     return args
 
 
+def solver(args) -> Callable:
+    """The solve function for the chosen engine and options"""
+    solve = ENGINES[args.engine]
+    if args.timeout is not None:
+        # One hard puzzle must not hold up its worker
+        solve = partial(sdk_solver.solve, timeout=args.timeout)
+    return solve
+
+
+def batch(args):
+    """Solve a whole collection, with statistics on stderr"""
+    if args.engine in VECTOR_ENGINES:
+        import sdk_numpy
+        stats = sdk_batch.run(args.files, sdk_numpy.solve_lines, args.output,
+                              jobs=args.jobs, ordered=not args.unordered,
+                              lines=args.lines, start=args.start,
+                              chunk_size=1024, vectorized=True)
+    else:
+        stats = sdk_batch.run(args.files, solver(args), args.output,
+                              jobs=args.jobs, ordered=not args.unordered,
+                              lines=args.lines, start=args.start)
+    print(stats, file=sys.stderr)
+
+
 def main():
     args = cli()
-    board = sdk_io.read(args.file)
+    if args.batch:
+        batch(args)
+        return
+    board = sdk_io.read(args.files[0])
     if args.display:
+        # Imported only when wanted, since it needs a window system
+        import sdk_display
         display = sdk_display.Board(board, 400, 400, scan=args.scan)
     if args.text:
+        import sdk_debugview
         monitor = sdk_debugview.Board(board)
-    sdk_solver.solve(board)
+    if args.engine in VECTOR_ENGINES:
+        import sdk_numpy
+        result = sdk_numpy.solve(board)
+    else:
+        result = solver(args)(board)
     if board.is_solved():
         print("\nSolved!")
+    elif getattr(result, "status", None) == sdk_solver.Result.GAVE_UP:
+        print("\nGave up ({})".format(result.reason))
     else:
         print("\nNot solved")
     print(board)
@@ -2,11 +2,30 @@
 Tests for Sudoku solver.
 """
 import unittest
+import io
+import os
+import tempfile
+import pickle
+from functools import partial
+import random
 
 import sdk_tile
 import sdk_board
 import sdk_solver
 import sdk_io
+import sdk_topology
+import sdk_dlx
+import sdk_batch
+import sdk_chains
+import sdk_generator
+import sdk_rating
+
+try:
+    import sdk_numpy
+except ImportError:
+    # NumPy is optional
+    sdk_numpy = None
+import events
 
 
 class test_tile_ops(unittest.TestCase):
@@ -45,6 +64,64 @@ class test_tile_ops(unittest.TestCase):
         self.assertEqual(tile.value, "7")
         self.assertEqual(tile.candidates, {"7"})
 
+    def test_candidate_mask(self):
+        tile = sdk_tile.Tile(0, 0)
+        self.assertEqual(tile.mask, sdk_tile.ALL_CANDIDATES)
+        self.assertFalse(tile.eliminate_mask(0))
+        self.assertTrue(tile.eliminate_mask(sdk_tile.mask_of("123456")))
+        self.assertEqual(sdk_tile.POPCOUNT[tile.mask], 3)
+        self.assertEqual(sdk_tile.MASK_CHOICES[tile.mask], ("7", "8", "9"))
+        self.assertEqual(tile.candidates, {"7", "8", "9"})
+        self.assertTrue(tile.eliminate_mask(sdk_tile.BIT["7"] | sdk_tile.BIT["9"]))
+        self.assertEqual(tile.value, "8")
+        self.assertEqual(tile.mask, sdk_tile.BIT["8"])
+
+    def test_listeners(self):
+        """Scan events go only to listeners that ask for them"""
+        class Recorder(sdk_tile.TileListener):
+            def __init__(self, scan: bool):
+                self.scan = scan
+                self.events = []
+
+            def notify(self, event: sdk_tile.TileEvent):
+                self.events.append(type(event).__name__)
+
+        tile = sdk_tile.Tile(0, 0)
+        quiet = Recorder(False)
+        scanning = Recorder(True)
+        tile.add_listener(quiet)
+        tile.add_listener(scanning)
+        tile.attend()
+        tile.eliminate({"1"})
+        tile.unattend()
+        self.assertEqual(quiet.events, ["TileChanged"])
+        self.assertEqual(scanning.events,
+                         ["TileAttend", "TileChanged", "TileUnattend"])
+
+    def test_batched_listeners(self):
+        """In a batch, listeners hear only the last change to a tile"""
+        class Recorder(sdk_tile.TileListener):
+            def __init__(self, batched: bool):
+                self.batched = batched
+                self.events = []
+
+            def notify(self, event: sdk_tile.TileEvent):
+                self.events.append((event.tile.index, event.tile.value))
+
+        first, second = sdk_tile.Tile(0, 0), sdk_tile.Tile(0, 1)
+        batched = Recorder(True)
+        immediate = Recorder(False)
+        for tile in (first, second):
+            tile.add_listener(batched)
+            tile.add_listener(immediate)
+        with events.Batch():
+            first.eliminate({"1", "2"})
+            second.eliminate({"1"})
+            first.eliminate({"3", "4", "5", "6", "7", "8"})
+            self.assertEqual(batched.events, [])
+        self.assertEqual(batched.events, [(1, "."), (0, "9")])
+        self.assertEqual(len(immediate.events), 4)
+
 
 naked_single_example = [
     ".........", "......1..", "......7..",
@@ -99,6 +176,19 @@ class test_board_ops(unittest.TestCase):
                     three_count += 1
         self.assertEqual(three_count, 3)
 
+    def test_topology(self):
+        """Groups follow the precomputed unit and peer tables"""
+        board = sdk_board.Board()
+        for unit, group in enumerate(board.groups):
+            self.assertEqual(group.unit, unit)
+            self.assertEqual([tile.index for tile in group.tiles],
+                             list(sdk_topology.UNIT_CELLS[unit]))
+        self.assertEqual(sdk_topology.CELL_UNITS[40], (4, 13, 22))
+        for peers in sdk_topology.PEERS:
+            self.assertEqual(len(peers), 20)
+        self.assertIn(80, sdk_topology.PEERS[60])
+        self.assertNotIn(80, sdk_topology.PEERS[0])
+
     def test_properties(self):
         board = sdk_board.Board()
         board.set_tiles(wikipedia_example)
@@ -113,6 +203,53 @@ class test_board_ops(unittest.TestCase):
         self.assertFalse(board.is_solved())
         self.assertFalse(board.is_consistent())
 
+    def test_flat_board(self):
+        """FlatBoard behaves like Board, creating tiles only on demand"""
+        board = sdk_board.FlatBoard()
+        board.set_tiles(wikipedia_example)
+        self.assertEqual(board.as_list(), wikipedia_example)
+        self.assertTrue(board.is_consistent())
+        self.assertFalse(board.is_solved())
+        self.assertEqual(board.unit_values(9), "56.847...")
+        self.assertIsNone(board._tiles)
+        copy = board.copy()
+        copy.set_tiles(wikipedia_solved)
+        self.assertTrue(copy.is_solved())
+        self.assertEqual(board.as_list(), wikipedia_example)
+        copy.set_tiles(wikipedia_wrong)
+        self.assertFalse(copy.is_consistent())
+        sdk_solver.propagate(board)
+        self.assertEqual(board.as_list(), wikipedia_solved)
+        self.assertEqual(board.tiles[0][2].value, "4")
+
+    def test_packed(self):
+        """Boards survive a trip through the binary forms"""
+        for kind in (sdk_board.Board, sdk_board.FlatBoard):
+            board = kind()
+            board.set_tiles(wikipedia_example)
+            sdk_solver.propagate(board, [0, 9, 18])
+            values = board.dump_values()
+            candidates = board.dump_candidates()
+            self.assertEqual(len(values), sdk_board.VALUES_SIZE)
+            self.assertEqual(len(candidates), sdk_board.CANDIDATES_SIZE)
+            copy = kind()
+            copy.load_values(memoryview(values))
+            self.assertEqual(copy.as_list(), board.as_list())
+            copy.load_candidates(candidates)
+            self.assertEqual([tile.mask for row in copy.tiles for tile in row],
+                             [tile.mask for row in board.tiles for tile in row])
+            # Codes above 9 are not values
+            corrupt = bytes([0xF0]) + values[1:]
+            with self.assertRaises(ValueError):
+                copy.load_values(corrupt)
+        other = sdk_board.Board()
+        other.set_tiles(wikipedia_solved)
+        for candidates in (False, True):
+            data = sdk_io.pack_boards([board, other], candidates)
+            self.assertEqual(len(data), 2 * sdk_io.packed_size(candidates))
+            self.assertEqual([b.as_list() for b in sdk_io.unpack_boards(data, candidates)],
+                             [board.as_list(), wikipedia_solved])
+
 
 class test_constraint_propagation(unittest.TestCase):
     """Solving by constraint propagation"""
@@ -129,6 +266,129 @@ class test_constraint_propagation(unittest.TestCase):
         sdk_solver.propagate(board)
         self.assertEqual(board.as_list(), hidden_single_propagated)
 
+    def test_journal(self):
+        """Tiles changed by tactics are recorded in the board journal"""
+        board = sdk_board.Board()
+        board.set_tiles(naked_single_example)
+        self.assertEqual(board.journal, [])
+        board.groups[0].naked_single_constrain()
+        self.assertEqual(board.journal, [])
+        board.groups[6].naked_single_constrain()
+        changed = {tile.index for tile, _, _ in board.journal}
+        self.assertEqual(changed, {54, 55, 56, 57, 58, 59, 61, 62})
+
+    def test_undo(self):
+        """Rolling back to a checkpoint restores values and candidates"""
+        board = sdk_board.Board()
+        board.set_tiles(wikipedia_example)
+        sdk_solver.propagate(board, [0])
+        before = [tile.mask for row in board.tiles for tile in row]
+        checkpoint = board.checkpoint()
+        board.tiles[0][2].set_value("1")
+        sdk_solver.propagate(board)
+        self.assertNotEqual([tile.mask for row in board.tiles for tile in row],
+                            before)
+        board.undo(checkpoint)
+        self.assertEqual([tile.mask for row in board.tiles for tile in row],
+                         before)
+        self.assertEqual(board.journal[checkpoint:], [])
+
+    def test_subsets(self):
+        """Naked and hidden pairs, using a row by itself"""
+        board = sdk_board.Board()
+        row = board.groups[0]
+        row.tiles[0].eliminate(set("3456789"))
+        row.tiles[4].eliminate(set("3456789"))
+        self.assertFalse(row.naked_subset_constrain(3))
+        self.assertTrue(row.naked_subset_constrain(2))
+        self.assertEqual(row.tiles[1].candidates, set("3456789"))
+        self.assertEqual(row.tiles[4].candidates, set("12"))
+        for tile in row.tiles[3:]:
+            tile.eliminate({"8", "9"})
+        self.assertTrue(row.hidden_subset_constrain(2))
+        self.assertEqual(row.tiles[1].candidates, {"8", "9"})
+        self.assertEqual(row.tiles[2].candidates, {"8", "9"})
+        self.assertFalse(row.hidden_subset_constrain(2))
+
+    def test_intersections(self):
+        """Pointing pair and box-line reduction in block 0"""
+        board = sdk_board.Board()
+        flat = sum(board.tiles, [])
+        for cell in [9, 10, 11, 18, 19, 20]:
+            flat[cell].eliminate({"1"})
+        for cell in range(12, 18):
+            flat[cell].eliminate({"2"})
+        self.assertEqual(len(board.intersections), 54)
+        top, middle = board.intersections[0], board.intersections[1]
+        self.assertFalse(top.box_line_constrain())
+        self.assertTrue(top.pointing_constrain())
+        self.assertEqual([cell for cell in range(81) if not flat[cell].could_be("1")],
+                         [3, 4, 5, 6, 7, 8, 9, 10, 11, 18, 19, 20])
+        self.assertTrue(middle.box_line_constrain())
+        self.assertEqual([cell for cell in range(81) if not flat[cell].could_be("2")],
+                         [0, 1, 2, 12, 13, 14, 15, 16, 17, 18, 19, 20])
+        flat_board = sdk_board.FlatBoard()
+        flat_board.set_tiles(board.as_list())
+        self.assertEqual(str(flat_board.intersections[53]), "Block from 2,2 x Column 8")
+
+    def test_fish(self):
+        """An X-Wing on 1 in rows 0 and 4, columns 2 and 6"""
+        board = sdk_board.Board()
+        for row in (0, 4):
+            for col in range(9):
+                if col not in (2, 6):
+                    board.tiles[row][col].eliminate({"1"})
+        self.assertFalse(sdk_solver.basic_fish(board, 3))
+        self.assertTrue(sdk_solver.basic_fish(board, 2))
+        for row in range(9):
+            expected = row in (0, 4)
+            self.assertEqual(board.tiles[row][2].could_be("1"), expected)
+            self.assertEqual(board.tiles[row][6].could_be("1"), expected)
+        self.assertFalse(sdk_solver.basic_fish(board, 2))
+
+    def test_occurrences(self):
+        """The per-value index follows changes and undo"""
+        board = sdk_io.read("data/veryhard.sdk")
+        sdk_solver.propagate(board, fish=4)
+        checkpoint = board.checkpoint()
+        board.tiles[0][1].set_value(sdk_tile.MASK_CHOICES[board.tiles[0][1].mask][0])
+        sdk_solver.propagate(board, fish=4)
+        board.undo(checkpoint)
+        board.occurrences.catch_up(board)
+        fresh = sdk_board.Occurrences()
+        fresh.catch_up(board)
+        self.assertEqual(board.occurrences.rows, fresh.rows)
+        self.assertEqual(board.occurrences.cols, fresh.cols)
+        board.set_tiles(wikipedia_solved)
+        board.occurrences.catch_up(board)
+        self.assertEqual(board.occurrences.rows[0][0], 1 << 7)
+
+    def test_propagate_subsets(self):
+        """Subsets find more, but never anything different"""
+        for name in ["evil", "veryhard"]:
+            singles = sdk_io.read("data/{}.sdk".format(name))
+            subsets = sdk_io.read("data/{}.sdk".format(name))
+            self.assertTrue(sdk_solver.propagate(singles))
+            self.assertTrue(sdk_solver.propagate(subsets, subsets=4))
+            for tile, fewer in zip(sum(singles.tiles, []), sum(subsets.tiles, [])):
+                self.assertEqual(tile.mask | fewer.mask, tile.mask)
+            stats = sdk_solver.SearchStats()
+            self.assertTrue(sdk_solver.solve(subsets, subsets=2, stats=stats))
+            self.assertTrue(sdk_solver.solve(singles))
+            self.assertEqual(subsets.as_list(), singles.as_list())
+        self.assertEqual(stats.nodes, 4)
+        board = sdk_io.read("data/veryhard.sdk")
+        stats = sdk_solver.SearchStats()
+        self.assertTrue(sdk_solver.solve(board, intersections=True, stats=stats))
+        self.assertEqual(board.as_list(), singles.as_list())
+        self.assertLess(stats.nodes, 6)
+        board = sdk_io.read("data/veryhard.sdk")
+        stats = sdk_solver.SearchStats()
+        self.assertTrue(sdk_solver.solve(board, intersections=True, subsets=2,
+                                         fish=4, stats=stats))
+        self.assertEqual(board.as_list(), singles.as_list())
+        self.assertEqual(stats.nodes, 0)
+
     def test_constraint_propagation(self):
         board = sdk_io.read("data/nakedhiddensingle5.sdk")
         sdk_solver.propagate(board)
@@ -138,5 +398,465 @@ class test_constraint_propagation(unittest.TestCase):
                           "648597321", "139268475", "752134986"])
 
 
+class test_probing(unittest.TestCase):
+    """Trying values out by propagation before guessing"""
+
+    def test_probe(self):
+        for name in ["evil", "veryhard"]:
+            plain = sdk_io.read("data/{}.sdk".format(name))
+            probed = sdk_io.read("data/{}.sdk".format(name))
+            stats = sdk_solver.SearchStats()
+            self.assertTrue(sdk_solver.solve(plain))
+            self.assertTrue(sdk_solver.solve(probed, probe=True, stats=stats))
+            self.assertEqual(probed.as_list(), plain.as_list())
+            self.assertEqual(stats.nodes, 0)
+            self.assertGreater(stats.probes, 0)
+
+    def test_unsolvable(self):
+        board = sdk_board.Board()
+        board.set_tiles(wikipedia_example)
+        board.tiles[0][2].set_value("1")
+        self.assertFalse(sdk_solver.solve(board, probe=True))
+
+
+class test_branching(unittest.TestCase):
+    """Choice of the tile to guess and the order of its values"""
+
+    def test_heuristics(self):
+        plain = sdk_io.read("data/veryhard.sdk")
+        self.assertTrue(sdk_solver.solve(plain))
+        for choose in sdk_solver.CHOOSERS:
+            for order in sdk_solver.ORDERS:
+                board = sdk_io.read("data/veryhard.sdk")
+                self.assertTrue(sdk_solver.solve(board, choose=choose,
+                                                 order=order))
+                self.assertEqual(board.as_list(), plain.as_list())
+
+    def test_degree(self):
+        board = sdk_board.Board()
+        board.set_tiles(wikipedia_example)
+        tile = sdk_solver.choose_tile_degree(board)
+        self.assertEqual(sdk_tile.POPCOUNT[tile.mask],
+                         sdk_tile.POPCOUNT[sdk_solver.choose_tile(board).mask])
+
+    def test_seeded(self):
+        counts = []
+        for seed in [3, 3]:
+            board = sdk_io.read("data/veryhard.sdk")
+            stats = sdk_solver.SearchStats()
+            sdk_solver.solve(board, order="random", seed=seed, stats=stats)
+            counts.append((stats.nodes, stats.backtracks))
+        self.assertEqual(counts[0], counts[1])
+
+
+class test_search(unittest.TestCase):
+    """Pausing, saving, and resuming the search"""
+
+    def test_resume(self):
+        plain = sdk_io.read("data/veryhard.sdk")
+        plain_stats = sdk_solver.SearchStats()
+        self.assertTrue(sdk_solver.solve(plain, stats=plain_stats))
+        board = sdk_io.read("data/veryhard.sdk")
+        search = sdk_solver.Search(board)
+        pauses = 0
+        while search.run(max_nodes=1) is None:
+            pauses += 1
+            state = pickle.loads(pickle.dumps(search.state()))
+            board = sdk_board.FlatBoard()
+            search = sdk_solver.Search.restore(board, state)
+        self.assertGreater(pauses, 0)
+        self.assertTrue(board.is_solved())
+        self.assertEqual(board.as_list(), plain.as_list())
+        self.assertEqual(search.stats.nodes, plain_stats.nodes)
+        self.assertEqual(search.stats.backtracks, plain_stats.backtracks)
+
+    def test_unsolvable(self):
+        board = sdk_board.Board()
+        board.set_tiles(wikipedia_example)
+        board.tiles[0][2].set_value("1")
+        search = sdk_solver.Search(board)
+        result = None
+        while result is None:
+            result = search.run(max_nodes=1)
+        self.assertFalse(result)
+        self.assertFalse(search.run())
+
+
+class Tripwire(sdk_solver.Cancel):
+    """Cancelled at the nth look, and not before or after"""
+
+    def __init__(self, n: int):
+        self.n = n
+
+    @property
+    def cancelled(self) -> bool:
+        self.n -= 1
+        return self.n == 0
+
+
+class test_budget(unittest.TestCase):
+    """Giving up on time, node, and cancellation limits"""
+
+    def test_result(self):
+        board = sdk_io.read("data/veryhard.sdk")
+        result = sdk_solver.solve(board, timeout=60)
+        self.assertTrue(result)
+        self.assertEqual(result.status, sdk_solver.Result.SOLVED)
+        board = sdk_board.Board()
+        board.set_tiles(wikipedia_example)
+        board.tiles[0][2].set_value("1")
+        result = sdk_solver.solve(board)
+        self.assertFalse(result)
+        self.assertEqual(result.status, sdk_solver.Result.UNSOLVABLE)
+
+    def test_limits(self):
+        board = sdk_io.read("data/veryhard.sdk")
+        result = sdk_solver.solve(board, max_nodes=2)
+        self.assertFalse(result)
+        self.assertEqual(result.status, sdk_solver.Result.GAVE_UP)
+        self.assertEqual(result.reason, "node limit")
+        self.assertEqual(result.stats.nodes, 2)
+        cancel = sdk_solver.Cancel()
+        cancel.cancel()
+        result = sdk_solver.solve(sdk_io.read("data/veryhard.sdk"),
+                                  cancel=cancel)
+        self.assertEqual(result.reason, "cancelled")
+        board = sdk_io.read("data/veryhard.sdk")
+        with self.assertRaises(sdk_solver.BudgetExceeded):
+            sdk_solver.propagate(board, budget=sdk_solver.Budget(cancel=cancel))
+
+    def test_interrupted(self):
+        """A guess whose propagation is cut short is finished by
+        the next run, a probe done again, and the work counted once
+        """
+        for options in [{}, {"probe": True}]:
+            plain = sdk_io.read("data/veryhard.sdk")
+            plain_stats = sdk_solver.SearchStats()
+            self.assertTrue(sdk_solver.solve(plain, stats=plain_stats, **options))
+            # Runs cut short part way through a guess's propagation,
+            # and at other times (when probing, in the middle of a probe)
+            mid_guess = 0
+            elsewhere = 0
+            for n in range(1, 120, 3):
+                board = sdk_io.read("data/veryhard.sdk")
+                search = sdk_solver.Search(board, **options)
+                budget = sdk_solver.Budget(cancel=Tripwire(n))
+                if search.run(budget=budget) is None:
+                    self.assertEqual(search.reason, "cancelled")
+                    if search.frames and search.agenda is not None:
+                        mid_guess += 1
+                    elif search.agenda is None:
+                        elsewhere += 1
+                self.assertTrue(search.run(budget=budget))
+                self.assertEqual(board.as_list(), plain.as_list())
+                self.assertEqual(search.stats.nodes, plain_stats.nodes)
+                self.assertEqual(search.stats.backtracks, plain_stats.backtracks)
+                self.assertEqual(search.stats.probes, plain_stats.probes)
+            self.assertGreater(elsewhere if options else mid_guess, 0)
+
+    def test_time_slices(self):
+        """Each run gets something done, however short the time"""
+        plain = sdk_io.read("data/veryhard.sdk")
+        self.assertTrue(sdk_solver.solve(plain, chains=True))
+        board = sdk_io.read("data/veryhard.sdk")
+        search = sdk_solver.Search(board, chains=True)
+        slices = 0
+        result = None
+        while result is None:
+            result = search.run(budget=sdk_solver.Budget(timeout=0))
+            slices += 1
+        self.assertTrue(result)
+        self.assertGreater(slices, 1)
+        self.assertEqual(board.as_list(), plain.as_list())
+
+
+class test_chains(unittest.TestCase):
+    """Nice loops and forcing chains"""
+
+    def test_forcing_chains(self):
+        """Solved without guessing"""
+        for name in ["forcingchain1", "forcingchain4"]:
+            board = sdk_io.read("data/{}.sdk".format(name))
+            stats = sdk_solver.SearchStats()
+            self.assertTrue(sdk_solver.solve(board, chains=True, stats=stats))
+            self.assertTrue(board.is_solved())
+            self.assertEqual(stats.nodes, 0)
+
+    def test_deduction(self):
+        board = sdk_io.read("data/forcingchain4.sdk")
+        sdk_solver.propagate(board)
+        graph = sdk_chains.graph(board)
+        # Each board keeps its own graph
+        self.assertIs(sdk_chains.graph(board), graph)
+        self.assertIsNot(sdk_chains.graph(sdk_board.FlatBoard()), graph)
+        self.assertIsNone(graph.find(budget=0))
+        self.assertIsNone(graph.find(seconds=0))
+        deduction = graph.find()
+        # The work done is the same every time, so a budget of
+        # exactly that much finds it again
+        self.assertEqual(str(graph.find(budget=graph.work)), str(deduction))
+        self.assertEqual(deduction.place, [(1 * 9 + 4) * 9 + 5])
+        self.assertTrue(str(deduction).startswith("nice loop: r2c5=6"))
+        self.assertTrue(deduction.apply(board))
+        self.assertEqual(board.tiles[1][4].value, "6")
+
+    def test_incremental(self):
+        """Keeping up with the journal gives the same graph as
+        building it again
+        """
+        board = sdk_io.read("data/forcingchain1.sdk")
+        graph = sdk_chains.LinkGraph(board)
+        sdk_solver.propagate(board)
+        graph.refresh()
+        checkpoint = board.checkpoint()
+        sdk_solver.propagate(board, intersections=True, subsets=2)
+        graph.refresh()
+        for rolled_back in (False, True):
+            fresh = sdk_chains.LinkGraph(board)
+            self.assertEqual(graph.weak, fresh.weak)
+            self.assertEqual(graph.strong, fresh.strong)
+            self.assertEqual(graph.alive, fresh.alive)
+            board.undo(checkpoint)
+            graph.refresh()
+
+
+class test_counting(unittest.TestCase):
+    """Counting solutions"""
+
+    def test_count(self):
+        board = sdk_board.Board()
+        board.set_tiles(wikipedia_example)
+        self.assertEqual(sdk_solver.count_solutions(board), 1)
+        self.assertTrue(sdk_solver.is_unique(board))
+        self.assertEqual(board.as_list(), wikipedia_example)
+        board.set_tiles(naked_single_example)
+        self.assertEqual(sdk_solver.count_solutions(board, limit=5), 5)
+        self.assertFalse(sdk_solver.is_unique(board))
+        self.assertEqual(board.as_list(), naked_single_example)
+        board.set_tiles(wikipedia_wrong)
+        self.assertEqual(sdk_solver.count_solutions(board), 0)
+
+    def test_hard_boards(self):
+        for name in ["evil", "veryhard", "forcingchain1", "forcingchain4"]:
+            board = sdk_io.read("data/{}.sdk".format(name))
+            self.assertTrue(sdk_solver.is_unique(board))
+
+
+class test_dlx(unittest.TestCase):
+    """The exact cover engine"""
+
+    def test_solve(self):
+        board = sdk_board.Board()
+        board.set_tiles(wikipedia_example)
+        self.assertTrue(sdk_dlx.solve(board))
+        self.assertEqual(board.as_list(), wikipedia_solved)
+
+    def test_hard_boards(self):
+        for name in ["evil", "veryhard", "forcingchain1", "forcingchain4"]:
+            board = sdk_io.read("data/{}.sdk".format(name))
+            searched = sdk_io.read("data/{}.sdk".format(name))
+            self.assertTrue(sdk_dlx.solve(board))
+            self.assertTrue(sdk_solver.solve(searched))
+            self.assertEqual(board.as_list(), searched.as_list())
+
+    def test_no_solution(self):
+        puzzle = "".join(wikipedia_example).replace("53", "55", 1)
+        self.assertEqual(sdk_dlx.solve_line(puzzle), [])
+        self.assertEqual(len(sdk_dlx.solve_line("." * 81, limit=3)), 3)
+
+
+class test_batch(unittest.TestCase):
+    """Reading and solving many puzzles at once"""
+
+    def test_read_all(self):
+        text = "# two boards\n" + "\n".join(wikipedia_example) + "\n\n" \
+               + "\n".join(wikipedia_solved) + "\n"
+        boards = list(sdk_io.read_all(io.StringIO(text)))
+        self.assertEqual(boards, [wikipedia_example, wikipedia_solved])
+        with self.assertRaises(sdk_io.InputError):
+            list(sdk_io.read_all(io.StringIO("\n".join(wikipedia_example[:5]))))
+
+    def test_lines(self):
+        """One puzzle per line, with any of the blank symbols"""
+        line = "".join(wikipedia_example)
+        text = "# header\n{}\n{}\n\n{}\n".format(
+            line, line.replace(".", "0"), line.replace(".", "_"))
+        self.assertEqual(list(sdk_io.read_lines(io.StringIO(text))),
+                         [line, line, line])
+        board = sdk_board.Board()
+        boards = sdk_io.read_boards(io.StringIO(text), board)
+        self.assertIs(next(boards), board)
+        self.assertEqual(board.as_list(), wikipedia_example)
+        out = io.StringIO()
+        with sdk_io.LineWriter(out, buffer_lines=2) as writer:
+            for board in sdk_io.read_boards(io.StringIO(text)):
+                writer.write(board)
+            writer.write(line)
+        self.assertEqual(out.getvalue(), (line + "\n") * 4)
+        self.assertEqual(list(sdk_io.read_all(io.StringIO(out.getvalue()))),
+                         [wikipedia_example] * 4)
+        with self.assertRaises(sdk_io.InputError):
+            sdk_io.parse_line(line[:80] + "x")
+
+    def test_corpus(self):
+        """Random access to a fixed-width one-line file"""
+        lines = ["".join(wikipedia_example), "".join(wikipedia_solved),
+                 "".join(wikipedia_example).replace(".", "0")]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "corpus.txt")
+            with open(path, "w") as f:
+                f.write("\n".join(lines))
+            self.assertTrue(sdk_io.is_corpus(path))
+            with sdk_io.Corpus(path) as corpus:
+                self.assertEqual(len(corpus), 3)
+                self.assertEqual(corpus[1], lines[1])
+                self.assertEqual(corpus[2], lines[0])
+                tail = corpus[1:]
+                self.assertEqual(len(tail), 2)
+                self.assertEqual(tail.offsets(), (82, 3 * 82))
+                self.assertEqual(list(tail), [lines[1], lines[0]])
+                self.assertEqual(corpus.board(0).as_list(), wikipedia_example)
+            out = io.StringIO()
+            stats = sdk_batch.run([path], sdk_dlx.solve, out, lines=True,
+                                  start=1, jobs=2, chunk_size=1)
+            self.assertEqual(len(stats.latencies), 2)
+            self.assertEqual(out.getvalue(), (lines[1] + "\n") * 2)
+
+    def test_run(self):
+        out = io.StringIO()
+        stats = sdk_batch.run(["data/evil.sdk", "data/veryhard.sdk"],
+                              sdk_dlx.solve, out)
+        self.assertEqual(len(stats.latencies), 2)
+        self.assertEqual(stats.solved, 2)
+        self.assertLessEqual(stats.percentile(50), stats.percentile(99))
+        results = list(sdk_io.read_all(io.StringIO(out.getvalue())))
+        board = sdk_io.read("data/evil.sdk")
+        sdk_solver.solve(board)
+        self.assertEqual(results[0], board.as_list())
+
+    def test_pool(self):
+        """Worker processes give the same results, in input order"""
+        alone = io.StringIO()
+        pooled = io.StringIO()
+        sdk_batch.run(["data"], sdk_solver.solve, alone)
+        stats = sdk_batch.run(["data"], sdk_solver.solve, pooled,
+                              jobs=2, chunk_size=3)
+        self.assertEqual(pooled.getvalue(), alone.getvalue())
+        self.assertEqual(stats.solved, len(stats.latencies))
+
+    def test_gave_up(self):
+        """Puzzles the solver gives up on are told apart"""
+        out = io.StringIO()
+        stats = sdk_batch.run(["data/evil.sdk", "data/veryhard.sdk"],
+                              partial(sdk_solver.solve, max_nodes=0), out)
+        self.assertEqual((stats.solved, stats.gave_up), (0, 2))
+        self.assertIn("# data/evil.sdk:1 gave up", out.getvalue())
+
+
+class test_rating(unittest.TestCase):
+    """Grading puzzles by the tactics they need"""
+
+    def test_ladder(self):
+        board = sdk_io.read("data/nakedsingle1.sdk")
+        rating = sdk_rating.rate(board)
+        self.assertTrue(rating.solved and board.is_solved())
+        self.assertEqual(list(rating.fired), ["naked single"])
+        self.assertEqual((rating.grade, rating.tier), (1.0, "easy"))
+        rating = sdk_rating.rate(sdk_io.read("data/nakedhiddensingle5.sdk"))
+        self.assertEqual((rating.grade, rating.guesses), (1.5, 0))
+
+    def test_tiers(self):
+        """Intersections, fish and chains fall in separate tiers"""
+        rating = sdk_rating.rate(sdk_io.read("data/evil.sdk"))
+        self.assertEqual((rating.grade, rating.tier), (3.0, "hard"))
+        rating = sdk_rating.rate(sdk_io.read("data/veryhard.sdk"))
+        self.assertEqual((rating.grade, rating.tier), (3.2, "tough"))
+        rating = sdk_rating.Rating()
+        rating.record("forcing chain", 7.0)
+        self.assertEqual(rating.tier, "expert")
+
+    def test_guessing(self):
+        board = sdk_io.read("data/naked_single_example.sdk")
+        rating = sdk_rating.rate(board)
+        self.assertTrue(board.is_solved())
+        self.assertGreater(rating.guesses, 0)
+        self.assertEqual(rating.grade, sdk_rating.GUESS_WEIGHT + rating.depth)
+        graded = list(sdk_rating.grade_all(["data/evil.sdk",
+                                            "data/nakedsingle1.sdk"]))
+        evil = sdk_rating.rate(sdk_io.read("data/evil.sdk"))
+        self.assertEqual([grade for _, grade, _ in graded], [evil.grade, 1.0])
+
+    def test_status(self):
+        """Grades of puzzles without exactly one solution are marked"""
+        rating = sdk_rating.rate(sdk_io.read("data/evil.sdk"))
+        self.assertEqual(rating.status, sdk_rating.UNIQUE)
+        rating = sdk_rating.rate_line("11" + "." * 79)
+        self.assertEqual(rating.status, sdk_rating.NO_SOLUTION)
+        self.assertTrue(str(rating).startswith("no solution: "))
+        rating = sdk_rating.rate_line("1" + "." * 80)
+        self.assertEqual(rating.status, sdk_rating.NOT_UNIQUE)
+
+
+class test_generator(unittest.TestCase):
+    """Making new puzzles"""
+
+    def test_orbits(self):
+        self.assertEqual(len(sdk_generator.orbits("none")), 81)
+        self.assertEqual(len(sdk_generator.orbits("rotational")), 41)
+        self.assertEqual(len(sdk_generator.orbits("quarter")), 21)
+        self.assertIn((0, 8, 72, 80), sdk_generator.orbits("quarter"))
+
+    def test_generate(self):
+        for symmetry in ["none", "rotational", "mirror"]:
+            puzzle = sdk_generator.generate(random.Random(3), 30, symmetry)
+            self.assertLessEqual(puzzle.count(sdk_tile.UNKNOWN), 81 - 17)
+            self.assertEqual(len(sdk_dlx.solve_line(puzzle, limit=2)), 1)
+            clues = [cell for cell in range(81)
+                     if puzzle[cell] != sdk_tile.UNKNOWN]
+            for orbit in sdk_generator.orbits(symmetry):
+                self.assertIn(len(set(orbit) & set(clues)), (0, len(orbit)))
+
+    def test_repeatable(self):
+        alone = list(sdk_generator.generate_many(4, seed=11))
+        pooled = list(sdk_generator.generate_many(4, seed=11, jobs=2))
+        self.assertEqual(alone, pooled)
+
+
+@unittest.skipIf(sdk_numpy is None, "NumPy not installed")
+class test_numpy(unittest.TestCase):
+    """The vectorized engine"""
+
+    def test_propagate(self):
+        """Same result as propagating one board at a time"""
+        names = ["nakedhiddensingle5", "evil", "veryhard", "naked_single_example"]
+        puzzles = [sdk_io.as_line(sdk_io.read("data/{}.sdk".format(name)))
+                   for name in names]
+        cands = sdk_numpy.candidates(puzzles)
+        solved, failed = sdk_numpy.propagate(cands)
+        self.assertEqual(list(solved), [True, False, False, False])
+        self.assertFalse(failed.any())
+        for puzzle, line in zip(puzzles, sdk_numpy.lines(cands)):
+            board = sdk_board.Board()
+            board.set_tiles(sdk_io.line_rows(puzzle))
+            sdk_solver.propagate(board)
+            self.assertEqual(line, sdk_io.as_line(board))
+
+    def test_solve_lines(self):
+        puzzles = [sdk_io.as_line(sdk_io.read("data/{}.sdk".format(name)))
+                   for name in ["evil", "nakedsingle1"]]
+        puzzles.append(puzzles[0].replace(".", "9", 1))
+        results = sdk_numpy.solve_lines(puzzles)
+        self.assertEqual([solved for _, solved in results], [True, True, False])
+        board = sdk_io.read("data/evil.sdk")
+        sdk_solver.solve(board)
+        self.assertEqual(results[0][0], sdk_io.as_line(board))
+        out = io.StringIO()
+        stats = sdk_batch.run(["data"], sdk_numpy.solve_lines, out,
+                              lines=True, vectorized=True)
+        self.assertEqual(stats.solved, 12)
+        # Latencies are shares of chunk times, not percentiles
+        self.assertNotIn("p99", str(stats))
+
+
 if __name__ == "__main__":
     unittest.main()